@@ -1,31 +1,62 @@
+import asyncio
+import json
 import os
 import sys
+import time
 from typing import Annotated
 from urllib.parse import parse_qs, urlsplit
-from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi import BackgroundTasks, FastAPI, Depends, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field
 from datetime import timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 try:
     from . import grounding
-    from .text_to_sql import baseline_text_to_sql, spts_text_to_sql, fix_sql_with_llm
+    from . import value_index
+    from .text_to_sql import baseline_text_to_sql, spts_text_to_sql, fix_sql_with_llm, get_schema_context
     from .database import execute_sql
+    from .db_client import get_schema_cache_stats, invalidate_schema_cache
+    from .embedding_util import get_embedding_cache_stats, save_embedding_cache
+    from .fuzzy_index import get_fuzzy_index_status
+    from .semantic_sql_cache import get_semantic_sql_cache_stats, remember_sql
+    from .llm_gateway import get_gateway_status
+    from .response_cache import (
+        drop_cached_response,
+        get_cached_response,
+        get_response_cache_stats,
+        invalidate_response_cache,
+        make_cache_key,
+        store_response,
+        update_cached_results,
+    )
+    from .entity_cache import get_entity_cache_stats
     from .db_users import ALLOWED_ROLES, create_user, get_user_by_username, normalize_role
     from .auth import verify_password, get_password_hash, create_access_token, get_current_user, require_roles, ACCESS_TOKEN_EXPIRE_MINUTES
+    from .auth import create_result_token, decode_result_token
     from . import session_logger
     from .sanitizer import sanitize_sql, SecurityViolationError
-    from .config import ALLOWED_ORIGINS, MAX_QUERY_LENGTH, MAX_REQUEST_BODY_BYTES, get_main_database_url
-    from kg.update_vlkg import delta_update
+    from .config import (
+        ALLOWED_ORIGINS,
+        MAX_QUERY_LENGTH,
+        MAX_REQUEST_BODY_BYTES,
+        SPTS_RESPONSE_CACHE_ENABLED,
+        SPTS_RESULT_ROW_CAP,
+        SPTS_VLKG_CHANGE_POLL_MINUTES,
+        get_main_database_url,
+    )
+    from kg.update_vlkg import change_polling_supported, delta_update, incremental_refresh
 except ImportError:
     CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
     PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
@@ -35,14 +66,39 @@ except ImportError:
         sys.path.insert(0, PROJECT_ROOT)
 
     import grounding
-    from text_to_sql import baseline_text_to_sql, spts_text_to_sql, fix_sql_with_llm
+    import value_index
+    from text_to_sql import baseline_text_to_sql, spts_text_to_sql, fix_sql_with_llm, get_schema_context
     from database import execute_sql
+    from db_client import get_schema_cache_stats, invalidate_schema_cache
+    from embedding_util import get_embedding_cache_stats, save_embedding_cache
+    from fuzzy_index import get_fuzzy_index_status
+    from semantic_sql_cache import get_semantic_sql_cache_stats, remember_sql
+    from llm_gateway import get_gateway_status
+    from response_cache import (
+        drop_cached_response,
+        get_cached_response,
+        get_response_cache_stats,
+        invalidate_response_cache,
+        make_cache_key,
+        store_response,
+        update_cached_results,
+    )
+    from entity_cache import get_entity_cache_stats
     from db_users import ALLOWED_ROLES, create_user, get_user_by_username, normalize_role
     from auth import verify_password, get_password_hash, create_access_token, get_current_user, require_roles, ACCESS_TOKEN_EXPIRE_MINUTES
+    from auth import create_result_token, decode_result_token
     import session_logger
     from sanitizer import sanitize_sql, SecurityViolationError
-    from config import ALLOWED_ORIGINS, MAX_QUERY_LENGTH, MAX_REQUEST_BODY_BYTES, get_main_database_url
-    from kg.update_vlkg import delta_update
+    from config import (
+        ALLOWED_ORIGINS,
+        MAX_QUERY_LENGTH,
+        MAX_REQUEST_BODY_BYTES,
+        SPTS_RESPONSE_CACHE_ENABLED,
+        SPTS_RESULT_ROW_CAP,
+        SPTS_VLKG_CHANGE_POLL_MINUTES,
+        get_main_database_url,
+    )
+    from kg.update_vlkg import change_polling_supported, delta_update, incremental_refresh
 
 limiter = Limiter(key_func=get_remote_address)
 
@@ -115,6 +171,31 @@ def _assert_read_only_main_db() -> None:
             "Unsafe database configuration: main SQLite database must be opened in strict read-only mode (mode=ro)."
         )
 
+
+def _scheduled_vlkg_refresh():
+    """Drops cached schema metadata, runs the VLKG delta job, then rebuilds derived indexes/caches."""
+    invalidate_schema_cache()
+    delta_update()
+    invalidate_response_cache()
+    value_index.build_value_index()
+    grounding.refresh_fuzzy_index()
+    save_embedding_cache()
+
+
+def _rebuild_vlkg():
+    if grounding.rebuild_vlkg():
+        invalidate_response_cache()
+
+
+def _scheduled_incremental_refresh():
+    """Refreshes only the tables whose change signals moved since the last VLKG run."""
+    changed_tables = incremental_refresh()
+    if changed_tables:
+        invalidate_response_cache()
+        value_index.build_value_index(tables=changed_tables)
+        grounding.refresh_fuzzy_index()
+
+
 @app.on_event("startup")
 def start_scheduler():
     """Starts the background task to run delta_update during off-peak hours."""
@@ -126,14 +207,30 @@ def start_scheduler():
     else:
         print("Warning: VLKG is not ready at startup. Grounding may be unavailable until bootstrap succeeds.")
 
+    if value_index.build_value_index():
+        print("Exact-match value index ready at startup.")
+
     # Schedule to run every day at 2:00 AM
-    scheduler.add_job(delta_update, CronTrigger(hour=2, minute=0))
+    scheduler.add_job(_scheduled_vlkg_refresh, CronTrigger(hour=2, minute=0))
+    poll_changes = SPTS_VLKG_CHANGE_POLL_MINUTES > 0 and change_polling_supported()
+    if poll_changes:
+        scheduler.add_job(
+            _scheduled_incremental_refresh,
+            IntervalTrigger(minutes=SPTS_VLKG_CHANGE_POLL_MINUTES),
+            max_instances=1,
+            coalesce=True,
+        )
     scheduler.start()
     print("Background scheduler started: VLKG Delta updates scheduled for 2:00 AM daily.")
+    if poll_changes:
+        print(f"Polling table change signals every {SPTS_VLKG_CHANGE_POLL_MINUTES} minute(s) for incremental VLKG refresh.")
+    elif SPTS_VLKG_CHANGE_POLL_MINUTES > 0:
+        print("Incremental VLKG polling disabled for this database dialect (set SPTS_VLKG_CHANGE_POLL_ALL_DIALECTS=true to enable).")
 
 @app.on_event("shutdown")
 def stop_scheduler():
     scheduler.shutdown()
+    save_embedding_cache()
 
 # Enabling CORS
 app.add_middleware(
@@ -169,6 +266,11 @@ async def read_root():
 def startup_health():
     db_health = _configured_database_health()
     vlkg_status = grounding.get_vlkg_status()
+    index_status = value_index.get_value_index_status()
+    embedding_cache = get_embedding_cache_stats()
+    fuzzy_status = get_fuzzy_index_status()
+    entity_cache = get_entity_cache_stats()
+    semantic_sql_cache = get_semantic_sql_cache_stats()
 
     status = "ok" if db_health.get("configured") else "degraded"
     return {
@@ -178,6 +280,35 @@ def startup_health():
             "collection_ready": bool(vlkg_status.get("collection_ready")),
             "mapping_count": int(vlkg_status.get("mapping_count", 0) or 0),
         },
+        "value_index": {
+            "ready": bool(index_status.get("ready")),
+            "indexed_columns": int(index_status.get("indexed_columns", 0) or 0),
+            "distinct_values": int(index_status.get("distinct_values", 0) or 0),
+        },
+        "fuzzy_index": {
+            "ready": bool(fuzzy_status.get("ready")),
+            "aliases": int(fuzzy_status.get("aliases", 0) or 0),
+        },
+        "entity_cache": {
+            "size": entity_cache["size"],
+            "hits": entity_cache["hits"],
+            "misses": entity_cache["misses"],
+            "hit_rate": entity_cache["hit_rate"],
+            "persistent": entity_cache["persistent"],
+        },
+        "semantic_sql_cache": {
+            "size": semantic_sql_cache["size"],
+            "hits": semantic_sql_cache["hits"],
+            "misses": semantic_sql_cache["misses"],
+            "rejected": semantic_sql_cache["rejected"],
+        },
+        "embedding_cache": {
+            "size": embedding_cache["size"],
+            "hits": embedding_cache["hits"],
+            "misses": embedding_cache["misses"],
+            "hit_rate": embedding_cache["hit_rate"],
+            "persistent": embedding_cache["persistent"],
+        },
     }
 
 class UserCreate(BaseModel):
@@ -190,6 +321,10 @@ class QueryPayload(BaseModel):
     query: str = Field(min_length=1, max_length=MAX_QUERY_LENGTH)
 
 
+class ResultPagePayload(BaseModel):
+    continuation_token: str = Field(min_length=1)
+
+
 QUERY_ALLOWED_ROLES = set(ALLOWED_ROLES)
 
 @app.post(
@@ -256,6 +391,97 @@ def admin_vlkg_status(
 ):
     return grounding.get_vlkg_status()
 
+
+@app.post(
+    "/admin/vlkg/rebuild",
+    responses={
+        403: {"description": "Insufficient role permissions"},
+    },
+)
+@limiter.limit("2/minute")
+def admin_rebuild_vlkg(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    _: Annotated[dict, Depends(require_roles("admin"))],
+):
+    # The build runs in a shadow collection; grounding keeps using the current graph until the swap.
+    background_tasks.add_task(_rebuild_vlkg)
+    return {"status": "scheduled"}
+
+
+@app.get(
+    "/admin/llm-gateway",
+    responses={
+        403: {"description": "Insufficient role permissions"},
+    },
+)
+@limiter.limit("20/minute")
+def admin_llm_gateway_status(
+    request: Request,
+    _: Annotated[dict, Depends(require_roles("admin"))],
+):
+    return get_gateway_status()
+
+
+@app.get(
+    "/admin/schema-cache",
+    responses={
+        403: {"description": "Insufficient role permissions"},
+    },
+)
+@limiter.limit("20/minute")
+def admin_schema_cache_status(
+    request: Request,
+    _: Annotated[dict, Depends(require_roles("admin"))],
+):
+    return get_schema_cache_stats()
+
+
+@app.post(
+    "/admin/schema-cache/invalidate",
+    responses={
+        403: {"description": "Insufficient role permissions"},
+    },
+)
+@limiter.limit("5/minute")
+def admin_invalidate_schema_cache(
+    request: Request,
+    _: Annotated[dict, Depends(require_roles("admin"))],
+):
+    invalidate_schema_cache()
+    invalidate_response_cache()
+    value_index.build_value_index()
+    return {"status": "ok", "schema_cache": get_schema_cache_stats()}
+
+
+@app.get(
+    "/admin/response-cache",
+    responses={
+        403: {"description": "Insufficient role permissions"},
+    },
+)
+@limiter.limit("20/minute")
+def admin_response_cache_status(
+    request: Request,
+    _: Annotated[dict, Depends(require_roles("admin"))],
+):
+    return get_response_cache_stats()
+
+
+@app.post(
+    "/admin/response-cache/invalidate",
+    responses={
+        403: {"description": "Insufficient role permissions"},
+    },
+)
+@limiter.limit("5/minute")
+def admin_invalidate_response_cache(
+    request: Request,
+    _: Annotated[dict, Depends(require_roles("admin"))],
+):
+    invalidate_response_cache()
+    return {"status": "ok", "response_cache": get_response_cache_stats()}
+
 @app.post("/token")
 @limiter.limit("5/minute")
 async def login_for_access_token(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
@@ -285,38 +511,40 @@ def _sanitize_or_raise(sql: str, label: str) -> str:
         raise HTTPException(status_code=400, detail=f"Unsafe {label} SQL blocked: {e}")
 
 
-@app.post(
-    "/query",
-    responses={
-        400: {"description": "Unsafe SQL blocked by sanitizer"},
-        429: {"description": "Rate limit exceeded"},
-        503: {"description": "SQL generation service unavailable"},
-    },
-)
-@limiter.limit("10/minute")
-def query(request: Request, payload: QueryPayload, current_user: Annotated[dict, Depends(require_roles(*QUERY_ALLOWED_ROLES))]):
-    user_query = payload.query.strip()
+def _extract_api_error(sql_text: str):
+    if not isinstance(sql_text, str):
+        return None
 
-    def extract_api_error(sql_text: str):
-        if not isinstance(sql_text, str):
-            return None
+    marker = "API Error:"
+    marker_index = sql_text.find(marker)
+    if marker_index == -1:
+        return None
+
+    detail = sql_text[marker_index + len(marker):]
+    if "*/" in detail:
+        detail = detail.split("*/", 1)[0]
+
+    detail = " ".join(detail.replace("\r", " ").replace("\n", " ").split())
+    detail = detail.strip(" -*\t")
+    return detail or "LLM service unavailable"
+
+
+async def _timed_stage(timings: dict, stage: str, func, *args):
+    """Run a blocking pipeline stage in a worker thread and record its wall time."""
+    start_time = time.perf_counter()
+    try:
+        return await asyncio.to_thread(func, *args)
+    finally:
+        timings[stage] = round((time.perf_counter() - start_time) * 1000, 2)
 
-        marker = "API Error:"
-        marker_index = sql_text.find(marker)
-        if marker_index == -1:
-            return None
 
-        detail = sql_text[marker_index + len(marker):]
-        if "*/" in detail:
-            detail = detail.split("*/", 1)[0]
-
-        detail = " ".join(detail.replace("\r", " ").replace("\n", " ").split())
-        detail = detail.strip(" -*\t")
-        return detail or "LLM service unavailable"
-    
-    # FIX: Use '_' to ignore the returned query string since we only need the mappings now
-    _, mappings = grounding.ground_query(user_query)
-    
+def _emit(emit, event: str, data: dict):
+    """Publish a partial result to a streaming client; a no-op for plain /query."""
+    if emit is not None:
+        emit(event, data)
+
+
+def _run_baseline_stage(user_query: str, emit=None):
     # Now returns {"sql": "...", "rationale": {...}}
     baseline_response = baseline_text_to_sql(user_query)
     baseline_sql = baseline_response["sql"]
@@ -324,57 +552,208 @@ def query(request: Request, payload: QueryPayload, current_user: Annotated[dict,
 
     baseline_sql = _sanitize_or_raise(baseline_sql, "baseline")
 
-    baseline_api_error = extract_api_error(baseline_sql)
+    baseline_api_error = _extract_api_error(baseline_sql)
     if baseline_api_error:
         raise HTTPException(
             status_code=503,
             detail=f"Baseline SQL generation unavailable: {baseline_api_error}",
         )
-    
+
+    _emit(emit, "baseline_sql", {"sql": baseline_sql, "rationale": baseline_rationale})
     baseline_result = execute_sql(baseline_sql)
+    _emit(emit, "baseline_result", _result_event(baseline_sql, baseline_result))
+    return baseline_sql, baseline_rationale, baseline_result
+
+
+def _run_spts_stage(user_query: str, mappings: list[dict], emit=None):
+    # We pass the original untouched user_query, plus our new Vector DB hints
+    spts_response = spts_text_to_sql(user_query, mappings)
+    spts_sql = spts_response["sql"]
+    spts_rationale = spts_response["rationale"]
+
+    spts_sql = _sanitize_or_raise(spts_sql, "SPTS")
+
+    spts_api_error = _extract_api_error(spts_sql)
+    if spts_api_error:
+        raise HTTPException(
+            status_code=503,
+            detail=f"SPTS SQL generation unavailable: {spts_api_error}",
+        )
+
+    _emit(emit, "spts_sql", {"sql": spts_sql, "rationale": spts_rationale})
+    spts_result = execute_sql(spts_sql)
+    _emit(emit, "spts_result", _result_event(spts_sql, spts_result))
+    return spts_sql, spts_rationale, spts_result
+
+
+def _run_spts_fix_stage(user_query: str, spts_sql: str, spts_error: str, mappings: list[dict], emit=None):
+    # fix_sql_with_llm still returns just the SQL string based on previous signature
+    spts_sql = fix_sql_with_llm(user_query, spts_sql, spts_error, mappings)
+    spts_sql = _sanitize_or_raise(spts_sql, "auto-corrected SPTS")
+    spts_fix_api_error = _extract_api_error(spts_sql)
+    if spts_fix_api_error:
+        raise HTTPException(
+            status_code=503,
+            detail=f"SPTS SQL auto-correction unavailable: {spts_fix_api_error}",
+        )
+    _emit(emit, "spts_sql", {"sql": spts_sql, "auto_corrected": True})
+    spts_result = execute_sql(spts_sql)
+    _emit(emit, "spts_result", {**_result_event(spts_sql, spts_result), "auto_corrected": True})
+    return spts_sql, spts_result
+
+
+def _format_result(res):
+    if res["success"]:
+        return res["data"]
+    return [(res["error"],)]
+
+
+def _result_page(sql: str, res) -> dict | None:
+    """Truncation metadata for an executed result; carries a continuation token when rows remain."""
+    if not res.get("success"):
+        return None
+    next_offset = res.get("next_offset")
+    return {
+        "offset": res.get("offset", 0),
+        "returned_rows": len(res["data"]),
+        "row_cap": SPTS_RESULT_ROW_CAP,
+        "truncated": bool(res.get("truncated")),
+        "continuation_token": create_result_token(sql, next_offset) if next_offset is not None else None,
+    }
+
+
+def _result_event(sql: str, res) -> dict:
+    return {"result": _format_result(res), "page": _result_page(sql, res)}
+
+
+def _response_cache_key(user_query: str) -> str:
+    _, schema_version = get_schema_context()
+    return make_cache_key(user_query, schema_version, grounding.get_vlkg_version())
+
+
+def _cached_query_response(cache_key: str):
+    """Serve /query from the response cache, re-executing cached SQL when only its results expired."""
+    cached = get_cached_response(cache_key)
+    if cached is None:
+        return None
+
+    response, results_fresh = cached
+    if not results_fresh:
+        baseline_result = execute_sql(response["baseline_sql"])
+        if response["spts_sql"] == response["baseline_sql"]:
+            spts_result = baseline_result
+        else:
+            spts_result = execute_sql(response["spts_sql"])
+
+        if not (baseline_result["success"] and spts_result["success"]):
+            # The data moved under the cached SQL; regenerate from scratch.
+            drop_cached_response(cache_key)
+            return None
+
+        results = {
+            "baseline_result": _format_result(baseline_result),
+            "baseline_result_page": _result_page(response["baseline_sql"], baseline_result),
+            "spts_result": _format_result(spts_result),
+            "spts_result_page": _result_page(response["spts_sql"], spts_result),
+        }
+        update_cached_results(cache_key, results)
+        response.update(results)
+
+    response["cache"] = {"hit": True, "results_refreshed": not results_fresh}
+    return response
+
+
+def _remember_validated_sql(user_query: str, mappings: list[dict], spts_stage):
+    """
+    Feed successfully executed, freshly generated SPTS SQL into the semantic SQL cache.
+    Baseline SQL has no grounded mappings to pin its literals, so it is never reused.
+    """
+    sql, rationale, result = spts_stage
+    if not result.get("success") or not isinstance(rationale, dict):
+        return
+    if "semantic_cache" in rationale or rationale.get("fallback_reason"):
+        return
+
+    try:
+        remember_sql(user_query, "spts", mappings, rationale.get("schema_version", ""), sql)
+    except Exception as e:
+        print(f"[semantic_sql_cache] Warning: could not record SQL: {e}")
+
+
+async def _run_query_pipeline(user_query: str, timings: dict, emit=None):
+    """
+    Ground, generate, execute and reflect on one question.
+    emit(event, data), when given, receives each stage's partial result as soon as it is ready;
+    it is called from worker threads and must be thread-safe.
+    """
+    grounding_details = {}
+
+    # Baseline generation does not depend on grounding, so both start immediately.
+    grounding_task = asyncio.create_task(
+        _timed_stage(timings, "grounding", grounding.ground_query, user_query, grounding_details)
+    )
+    baseline_task = asyncio.create_task(
+        _timed_stage(timings, "baseline", _run_baseline_stage, user_query, emit)
+    )
+
+    try:
+        # FIX: Use '_' to ignore the returned query string since we only need the mappings now
+        _, mappings = await grounding_task
+    except BaseException:
+        baseline_task.cancel()
+        raise
+
+    _emit(emit, "grounding", {"mappings": mappings})
 
     has_exact_mapping = any(
         "exact" in str(mapping.get("type", "")).lower()
         for mapping in (mappings or [])
     )
 
+    # SPTS generation overlaps with any baseline work still in flight.
+    spts_task = None
+    if has_exact_mapping:
+        spts_task = asyncio.create_task(
+            _timed_stage(timings, "spts", _run_spts_stage, user_query, mappings, emit)
+        )
+
+    # Await everything before raising so baseline errors keep precedence over SPTS errors.
+    stage_results = await asyncio.gather(
+        baseline_task,
+        *([spts_task] if spts_task is not None else []),
+        return_exceptions=True,
+    )
+    for stage_result in stage_results:
+        if isinstance(stage_result, BaseException):
+            raise stage_result
+
+    baseline_sql, baseline_rationale, baseline_result = stage_results[0]
+
     # If grounding has no exact matches, keep SPTS aligned with baseline under same-model fairness.
-    if not has_exact_mapping:
+    if spts_task is None:
         spts_sql = baseline_sql
         spts_rationale = {
             "fallback_reason": "no_exact_grounding_matches",
             "mirrors_baseline": True,
         }
         spts_result = baseline_result
+        _emit(emit, "spts_sql", {"sql": spts_sql, "rationale": spts_rationale})
+        _emit(emit, "spts_result", _result_event(spts_sql, spts_result))
     else:
-        # We pass the original untouched user_query, plus our new Vector DB hints
-        spts_response = spts_text_to_sql(user_query, mappings)
-        spts_sql = spts_response["sql"]
-        spts_rationale = spts_response["rationale"]
-
-        spts_sql = _sanitize_or_raise(spts_sql, "SPTS")
-
-        spts_api_error = extract_api_error(spts_sql)
-        if spts_api_error:
-            raise HTTPException(
-                status_code=503,
-                detail=f"SPTS SQL generation unavailable: {spts_api_error}",
-            )
-
-        spts_result = execute_sql(spts_sql)
+        spts_sql, spts_rationale, spts_result = stage_results[1]
 
     # 1-pass auto-correction loop for SPTS
     if mappings and not spts_result["success"]:
-        # fix_sql_with_llm still returns just the SQL string based on previous signature
-        spts_sql = fix_sql_with_llm(user_query, spts_sql, spts_result["error"], mappings)
-        spts_sql = _sanitize_or_raise(spts_sql, "auto-corrected SPTS")
-        spts_fix_api_error = extract_api_error(spts_sql)
-        if spts_fix_api_error:
-            raise HTTPException(
-                status_code=503,
-                detail=f"SPTS SQL auto-correction unavailable: {spts_fix_api_error}",
-            )
-        spts_result = execute_sql(spts_sql)
+        spts_sql, spts_result = await _timed_stage(
+            timings,
+            "spts_auto_correction",
+            _run_spts_fix_stage,
+            user_query,
+            spts_sql,
+            spts_result["error"],
+            mappings,
+            emit,
+        )
         # Optional: we update rationale to indicate a fix occurred, but keep the original latency/tokens for simplicity or add a flag
         spts_rationale["auto_corrected"] = True
 
@@ -384,39 +763,171 @@ def query(request: Request, payload: QueryPayload, current_user: Annotated[dict,
         spts_result = baseline_result
         if isinstance(spts_rationale, dict):
             spts_rationale["fallback_reason"] = "spts_execution_failed_used_baseline"
+        _emit(emit, "spts_sql", {"sql": spts_sql, "fallback_reason": "spts_execution_failed_used_baseline"})
+        _emit(emit, "spts_result", _result_event(spts_sql, spts_result))
+
+    for rationale, result in ((baseline_rationale, baseline_result), (spts_rationale, spts_result)):
+        if isinstance(rationale, dict) and result.get("guard"):
+            rationale["execution_guard"] = result["guard"]
+
+    if isinstance(spts_rationale, dict) and "entity_extraction" in grounding_details:
+        spts_rationale["entity_extraction"] = grounding_details["entity_extraction"]
+
+    if spts_task is not None:
+        await asyncio.to_thread(
+            _remember_validated_sql,
+            user_query,
+            mappings,
+            (spts_sql, spts_rationale, spts_result),
+        )
 
     # Safely format result for frontend compatibility (`app.js` expects arrays)
-    def format_res(res):
-        if res["success"]:
-            return res["data"]
-        return [(res["error"],)]
-
     response = {
         "baseline_sql": baseline_sql,
-        "baseline_result": format_res(baseline_result),
+        "baseline_result": _format_result(baseline_result),
+        "baseline_result_page": _result_page(baseline_sql, baseline_result),
         "baseline_rationale": baseline_rationale,
         "spts_sql": spts_sql,
-        "spts_result": format_res(spts_result),
+        "spts_result": _format_result(spts_result),
+        "spts_result_page": _result_page(spts_sql, spts_result),
         "spts_rationale": spts_rationale,
         "mappings": mappings,
     }
+    # Only fully successful answers are worth replaying from the response cache.
+    cacheable = bool(baseline_result.get("success")) and bool(spts_result.get("success"))
+    return response, cacheable
+
+
+async def _answer_query(user_query: str, current_user: dict, emit=None) -> dict:
+    """Shared body of /query and /query/stream: response cache, pipeline, session log and timings."""
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    cache_key = None
+    response = None
+    if SPTS_RESPONSE_CACHE_ENABLED:
+        try:
+            cache_key = await asyncio.to_thread(_response_cache_key, user_query)
+            response = await _timed_stage(timings, "response_cache", _cached_query_response, cache_key)
+        except Exception as cache_err:
+            print(f"[response_cache] Warning: lookup failed: {cache_err}")
+            cache_key = None
+
+    if response is None:
+        response, cacheable = await _run_query_pipeline(user_query, timings, emit)
+        if cache_key is not None and cacheable:
+            store_response(cache_key, response)
+        if SPTS_RESPONSE_CACHE_ENABLED:
+            response["cache"] = {"hit": False, "results_refreshed": False}
 
     # Log to the per-user session file (no-op if sessions dir doesn't exist)
     try:
-        query_index = session_logger.log_query(
-            username=current_user["username"],
-            role=current_user.get("role", "analyst"),
-            query=user_query,
-            payload=response,
+        query_index = await _timed_stage(
+            timings,
+            "session_log",
+            session_logger.log_query,
+            current_user["username"],
+            current_user.get("role", "analyst"),
+            user_query,
+            response,
         )
         response["query_index"] = query_index
     except Exception as log_err:
         print(f"[session_logger] Warning: could not write session file: {log_err}")
         response["query_index"] = None
 
+    timings["total"] = round((time.perf_counter() - pipeline_start) * 1000, 2)
+    response["timings_ms"] = timings
+
     return response
 
 
+@app.post(
+    "/query",
+    responses={
+        400: {"description": "Unsafe SQL blocked by sanitizer"},
+        429: {"description": "Rate limit exceeded"},
+        503: {"description": "SQL generation service unavailable"},
+    },
+)
+@limiter.limit("10/minute")
+async def query(request: Request, payload: QueryPayload, current_user: Annotated[dict, Depends(require_roles(*QUERY_ALLOWED_ROLES))]):
+    return await _answer_query(payload.query.strip(), current_user)
+
+
+@app.post(
+    "/query/results",
+    responses={
+        400: {"description": "Invalid or expired continuation token, or the query no longer executes"},
+        429: {"description": "Rate limit exceeded"},
+    },
+)
+@limiter.limit("30/minute")
+async def query_results_page(request: Request, payload: ResultPagePayload, current_user: Annotated[dict, Depends(require_roles(*QUERY_ALLOWED_ROLES))]):
+    """Next page (at most SPTS_RESULT_ROW_CAP rows) of a truncated baseline or SPTS result."""
+    sql, offset = decode_result_token(payload.continuation_token)
+    result = await asyncio.to_thread(execute_sql, sql, offset)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=f"Could not fetch result page: {result['error']}")
+    return {"rows": result["data"], "page": _result_page(sql, result)}
+
+
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@app.post(
+    "/query/stream",
+    responses={
+        200: {"description": "Server-sent events: grounding, baseline_sql, baseline_result, spts_sql, spts_result, then complete or error"},
+        429: {"description": "Rate limit exceeded"},
+    },
+)
+@limiter.limit("10/minute")
+async def query_stream(request: Request, payload: QueryPayload, current_user: Annotated[dict, Depends(require_roles(*QUERY_ALLOWED_ROLES))]):
+    """
+    Streaming variant of /query. Each stage is pushed as a server-sent event when it
+    completes; the final `complete` event carries the same body /query returns.
+    Pipeline failures arrive as an `error` event with the status code /query would use.
+    """
+    user_query = payload.query.strip()
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def run_pipeline():
+        try:
+            emit("complete", await _answer_query(user_query, current_user, emit))
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"[query_stream] Error: {e}")
+            emit("error", {"status_code": 500, "detail": "Query pipeline failed"})
+        finally:
+            emit(None, None)
+
+    async def event_stream():
+        pipeline_task = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                event, data = await events.get()
+                if event is None:
+                    break
+                yield _sse_event(event, data)
+        finally:
+            # Client disconnected: stop waiting on the remaining stages.
+            if not pipeline_task.done():
+                pipeline_task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 
 class FeedbackPayload(BaseModel):
     query_index: int
@@ -5,12 +5,13 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 try:
     from .db_users import get_user_by_username
-    from .config import SECRET_KEY
+    from .config import SECRET_KEY, SPTS_RESULT_TOKEN_TTL_SECONDS
 except ImportError:
     from db_users import get_user_by_username
-    from config import SECRET_KEY
+    from config import SECRET_KEY, SPTS_RESULT_TOKEN_TTL_SECONDS
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days for convenience
+RESULT_TOKEN_TYPE = "result_page"
 
 # We specify token URL for OAuth2 to match our FastAPI endpoint we will create
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -32,6 +33,31 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_result_token(sql: str, offset: int) -> str:
+    """Signed continuation token for the next page of an executed query's results."""
+    expire = datetime.now(timezone.utc) + timedelta(seconds=SPTS_RESULT_TOKEN_TTL_SECONDS)
+    payload = {"typ": RESULT_TOKEN_TYPE, "sql": sql, "offset": offset, "exp": expire}
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_result_token(token: str) -> tuple[str, int]:
+    """Return (sql, offset) from a continuation token; HTTP 400 if it is forged, malformed or expired."""
+    invalid_token = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid or expired continuation token",
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise invalid_token
+
+    sql = payload.get("sql")
+    offset = payload.get("offset")
+    if payload.get("typ") != RESULT_TOKEN_TYPE or not isinstance(sql, str) or not isinstance(offset, int) or offset < 0:
+        raise invalid_token
+    return sql, offset
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -174,3 +174,164 @@ SPTS_SQL_REFLECTION_ENABLED = _as_bool(
 SPTS_SQL_REFLECTION_SCOPE = (
     os.getenv("SPTS_SQL_REFLECTION_SCOPE", "spts").strip().lower()
 )
+
+# In-memory value index used for exact schema matching during grounding.
+# Columns with more distinct values than the cap are kept as sorted 64-bit value hashes.
+SPTS_VALUE_INDEX_ENABLED = _as_bool(
+    os.getenv("SPTS_VALUE_INDEX_ENABLED"),
+    default=True,
+)
+SPTS_VALUE_INDEX_MAX_DISTINCT = int(os.getenv("SPTS_VALUE_INDEX_MAX_DISTINCT") or "5000")
+
+# Embedding cache: bounded LRU keyed by model name + exact embedded text.
+# Set SPTS_EMBEDDING_CACHE_DIR to persist it across restarts (float32 .npy + key index).
+SPTS_EMBEDDING_CACHE_SIZE = int(os.getenv("SPTS_EMBEDDING_CACHE_SIZE") or "10000")
+SPTS_EMBEDDING_CACHE_DIR = get_optional_env_path("SPTS_EMBEDDING_CACHE_DIR")
+
+# VLKG synonym generation concurrency. Requests are paced to stay under
+# SPTS_SYNONYM_RPM_PER_KEY for every configured Groq key combined.
+# SPTS_SYNONYM_MAX_WORKERS=0 sizes the pool automatically (2 workers per key).
+SPTS_SYNONYM_MAX_WORKERS = int(os.getenv("SPTS_SYNONYM_MAX_WORKERS") or "0")
+SPTS_SYNONYM_RPM_PER_KEY = int(os.getenv("SPTS_SYNONYM_RPM_PER_KEY") or "30")
+SPTS_SYNONYM_ATTEMPTS_PER_KEY = int(os.getenv("SPTS_SYNONYM_ATTEMPTS_PER_KEY") or "2")
+# Number of values from one column sent per synonym prompt (1 disables batching).
+SPTS_SYNONYM_BATCH_SIZE = int(os.getenv("SPTS_SYNONYM_BATCH_SIZE") or "10")
+
+# Persistent synonym store so VLKG rebuilds only pay LLM cost for unseen values.
+SPTS_SYNONYM_CACHE_ENABLED = _as_bool(
+    os.getenv("SPTS_SYNONYM_CACHE_ENABLED"),
+    default=True,
+)
+SYNONYM_STORE_PATH = get_env_path("SPTS_SYNONYM_STORE_PATH", os.path.join("kg", "synonym_cache.sqlite"))
+
+# Sidecar manifest of profiled (table, column, canonical) signatures for VLKG delta runs.
+VLKG_MANIFEST_PATH = get_env_path("SPTS_VLKG_MANIFEST_PATH", os.path.join("kg", "vlkg_manifest.sqlite"))
+VLKG_MANIFEST_PAGE_SIZE = int(os.getenv("SPTS_VLKG_MANIFEST_PAGE_SIZE") or "1000")
+# Poll per-table change signals (pg_stat_user_tables / row counts) and refresh
+# only changed tables between nightly delta runs. 0 disables polling.
+SPTS_VLKG_CHANGE_POLL_MINUTES = int(os.getenv("SPTS_VLKG_CHANGE_POLL_MINUTES") or "5")
+# Other dialects have no cheap signal (every poll would COUNT(*) each table),
+# so polling them is opt-in.
+SPTS_VLKG_CHANGE_POLL_ALL_DIALECTS = _as_bool(
+    os.getenv("SPTS_VLKG_CHANGE_POLL_ALL_DIALECTS"),
+    default=False,
+)
+# SQLite in-place UPDATEs move the database file but not any table's row
+# count/max(rowid). Such unattributed changes trigger an all-table delta run,
+# at most once per this many minutes.
+SPTS_VLKG_UNATTRIBUTED_REFRESH_MINUTES = int(os.getenv("SPTS_VLKG_UNATTRIBUTED_REFRESH_MINUTES") or "60")
+
+# Profiling of high-cardinality VLKG columns (more distinct values than the
+# small-column limit). Modes: topk (most frequent values), sample (seeded
+# reservoir sample of distinct values), full (chunked enumeration), skip.
+SPTS_VLKG_PROFILE_MODE = (os.getenv("SPTS_VLKG_PROFILE_MODE") or "topk").strip().lower()
+# Values profiled per high-cardinality column (0 = unlimited, full mode only).
+SPTS_VLKG_COLUMN_BUDGET = int(os.getenv("SPTS_VLKG_COLUMN_BUDGET") or "1000")
+# Per-column overrides, e.g. "schools.School=5000,frpm.County Name=0".
+SPTS_VLKG_COLUMN_BUDGETS_RAW = os.getenv("SPTS_VLKG_COLUMN_BUDGETS", "")
+# Values streamed, embedded and stored per chunk.
+SPTS_VLKG_PROFILE_CHUNK_SIZE = int(os.getenv("SPTS_VLKG_PROFILE_CHUNK_SIZE") or "500")
+# Only the first N values of a column get LLM synonyms (0 disables them);
+# the rest are embedded with their canonical form and initials.
+SPTS_VLKG_SYNONYM_VALUE_LIMIT = int(os.getenv("SPTS_VLKG_SYNONYM_VALUE_LIMIT") or "100")
+# Print a progress line every N profiled values of a column (0 disables).
+SPTS_VLKG_PROGRESS_EVERY = int(os.getenv("SPTS_VLKG_PROGRESS_EVERY") or "1000")
+
+
+def get_vlkg_column_budgets() -> dict[str, int]:
+    budgets = {}
+    for entry in SPTS_VLKG_COLUMN_BUDGETS_RAW.split(","):
+        name, separator, budget = entry.rpartition("=")
+        if not separator or not name.strip():
+            continue
+        try:
+            budgets[name.strip()] = int(budget.strip())
+        except ValueError:
+            print(f"Warning: ignoring invalid SPTS_VLKG_COLUMN_BUDGETS entry '{entry.strip()}'.")
+    return budgets
+
+
+SPTS_VLKG_COLUMN_BUDGETS = get_vlkg_column_budgets()
+
+# Character-trigram fuzzy index over VLKG aliases, consulted before embeddings/Chroma.
+SPTS_FUZZY_INDEX_ENABLED = _as_bool(
+    os.getenv("SPTS_FUZZY_INDEX_ENABLED"),
+    default=True,
+)
+# Minimum trigram similarity for a lexical candidate (its distance is 1 - similarity).
+SPTS_FUZZY_MIN_SIMILARITY = float(os.getenv("SPTS_FUZZY_MIN_SIMILARITY") or "0.5")
+# Word-level similarity at which a misspelt token counts as overlapping ("Alamda" ~ "Alameda").
+SPTS_FUZZY_TOKEN_SIMILARITY = float(os.getenv("SPTS_FUZZY_TOKEN_SIMILARITY") or "0.6")
+
+# Cache of LLM entity extractions keyed by normalized question + model.
+# Set SPTS_ENTITY_CACHE_PATH to a SQLite file to persist it across restarts.
+SPTS_ENTITY_CACHE_ENABLED = _as_bool(
+    os.getenv("SPTS_ENTITY_CACHE_ENABLED"),
+    default=True,
+)
+SPTS_ENTITY_CACHE_SIZE = int(os.getenv("SPTS_ENTITY_CACHE_SIZE") or "2000")
+SPTS_ENTITY_CACHE_TTL_SECONDS = int(os.getenv("SPTS_ENTITY_CACHE_TTL_SECONDS") or "86400")
+SPTS_ENTITY_CACHE_PATH = get_optional_env_path("SPTS_ENTITY_CACHE_PATH")
+
+# Optional whole-request /query cache keyed by normalized question, schema
+# fingerprint and VLKG version. Generated SQL and execution results expire
+# separately; expired results are refreshed by re-running the cached SQL.
+SPTS_RESPONSE_CACHE_ENABLED = _as_bool(
+    os.getenv("SPTS_RESPONSE_CACHE_ENABLED"),
+    default=False,
+)
+SPTS_RESPONSE_CACHE_SIZE = int(os.getenv("SPTS_RESPONSE_CACHE_SIZE") or "500")
+SPTS_RESPONSE_CACHE_SQL_TTL_SECONDS = int(os.getenv("SPTS_RESPONSE_CACHE_SQL_TTL_SECONDS") or "86400")
+SPTS_RESPONSE_CACHE_RESULT_TTL_SECONDS = int(os.getenv("SPTS_RESPONSE_CACHE_RESULT_TTL_SECONDS") or "300")
+
+# Semantic SQL cache: paraphrased questions (cosine similarity of question
+# embeddings >= threshold) with identical grounded mappings and numbers reuse
+# previously validated SQL instead of calling Groq.
+SPTS_SEMANTIC_SQL_CACHE_ENABLED = _as_bool(
+    os.getenv("SPTS_SEMANTIC_SQL_CACHE_ENABLED"),
+    default=False,
+)
+SPTS_SEMANTIC_SQL_CACHE_SIZE = int(os.getenv("SPTS_SEMANTIC_SQL_CACHE_SIZE") or "2000")
+SPTS_SEMANTIC_SQL_CACHE_THRESHOLD = float(os.getenv("SPTS_SEMANTIC_SQL_CACHE_THRESHOLD") or "0.95")
+
+# Groq key-pool scheduler: callers queue for up to SPTS_GROQ_QUEUE_TIMEOUT_SECONDS
+# while every key is out of budget or cooling down after a rate-limit error.
+SPTS_GROQ_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SPTS_GROQ_QUEUE_TIMEOUT_SECONDS") or "60")
+SPTS_GROQ_MAX_IN_FLIGHT_PER_KEY = int(os.getenv("SPTS_GROQ_MAX_IN_FLIGHT_PER_KEY") or "4")
+SPTS_GROQ_COOLDOWN_SECONDS = float(os.getenv("SPTS_GROQ_COOLDOWN_SECONDS") or "2")
+# One pooled HTTP client (keep-alive connections) is shared by every Groq key.
+SPTS_LLM_MAX_CONNECTIONS = int(os.getenv("SPTS_LLM_MAX_CONNECTIONS") or "20")
+SPTS_LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SPTS_LLM_MAX_KEEPALIVE_CONNECTIONS") or "10")
+
+# Bounded result delivery: at most SPTS_RESULT_ROW_CAP rows per query or page,
+# pulled from the cursor in fetchmany batches. Further rows are reachable with
+# a signed continuation token (POST /query/results).
+SPTS_RESULT_ROW_CAP = int(os.getenv("SPTS_RESULT_ROW_CAP") or "1000")
+SPTS_RESULT_FETCH_BATCH_SIZE = int(os.getenv("SPTS_RESULT_FETCH_BATCH_SIZE") or "200")
+SPTS_RESULT_TOKEN_TTL_SECONDS = int(os.getenv("SPTS_RESULT_TOKEN_TTL_SECONDS") or "3600")
+
+# Generated SQL guard rails. Every statement is interrupted after
+# SPTS_SQL_STATEMENT_TIMEOUT_MS (0 disables): SQLite through a progress
+# handler, PostgreSQL through SET LOCAL statement_timeout, and all dialects by
+# a wall-clock check between fetch batches. The optional EXPLAIN-based cost
+# guard (off | reject | limit) rejects plans above SPTS_SQL_COST_GUARD_MAX_COST
+# or wraps them in LIMIT SPTS_SQL_COST_GUARD_LIMIT_ROWS.
+SPTS_SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SPTS_SQL_STATEMENT_TIMEOUT_MS") or "15000")
+SPTS_SQL_COST_GUARD_MODE = (os.getenv("SPTS_SQL_COST_GUARD_MODE") or "off").strip().lower()
+SPTS_SQL_COST_GUARD_MAX_COST = float(os.getenv("SPTS_SQL_COST_GUARD_MAX_COST") or "10000000")
+SPTS_SQL_COST_GUARD_LIMIT_ROWS = int(os.getenv("SPTS_SQL_COST_GUARD_LIMIT_ROWS") or str(SPTS_RESULT_ROW_CAP))
+
+# Connection pooling for the main query database (and evaluation targets).
+# SQLite read-only files get an mmap window and may be opened immutable (no
+# locking or change detection: only for files that never change while served);
+# PostgreSQL connections use TCP keepalives so idle pooled sockets survive NAT
+# and load-balancer timeouts.
+SPTS_DB_POOL_SIZE = int(os.getenv("SPTS_DB_POOL_SIZE") or "5")
+SPTS_DB_MAX_OVERFLOW = int(os.getenv("SPTS_DB_MAX_OVERFLOW") or "10")
+SPTS_DB_POOL_TIMEOUT_SECONDS = float(os.getenv("SPTS_DB_POOL_TIMEOUT_SECONDS") or "30")
+SPTS_DB_POOL_RECYCLE_SECONDS = int(os.getenv("SPTS_DB_POOL_RECYCLE_SECONDS") or "1800")
+SPTS_DB_POOL_PRE_PING = _as_bool(os.getenv("SPTS_DB_POOL_PRE_PING"), default=True)
+SPTS_DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("SPTS_DB_CONNECT_TIMEOUT_SECONDS") or "10")
+SPTS_SQLITE_MMAP_SIZE = int(os.getenv("SPTS_SQLITE_MMAP_SIZE") or str(256 * 1024 * 1024))
+SPTS_SQLITE_IMMUTABLE = _as_bool(os.getenv("SPTS_SQLITE_IMMUTABLE"), default=False)
+SPTS_PG_KEEPALIVES_IDLE_SECONDS = int(os.getenv("SPTS_PG_KEEPALIVES_IDLE_SECONDS") or "30")
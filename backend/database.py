@@ -1,11 +1,92 @@
 try:
-    from .db_client import execute_raw_sql
+    from .config import (
+        SPTS_SQL_COST_GUARD_LIMIT_ROWS,
+        SPTS_SQL_COST_GUARD_MAX_COST,
+        SPTS_SQL_COST_GUARD_MODE,
+        SPTS_SQL_STATEMENT_TIMEOUT_MS,
+    )
+    from .db_client import QueryTimeoutError, estimate_query_cost, execute_raw_sql_page, limit_sql
 except ImportError:
-    from db_client import execute_raw_sql
+    from config import (
+        SPTS_SQL_COST_GUARD_LIMIT_ROWS,
+        SPTS_SQL_COST_GUARD_MAX_COST,
+        SPTS_SQL_COST_GUARD_MODE,
+        SPTS_SQL_STATEMENT_TIMEOUT_MS,
+    )
+    from db_client import QueryTimeoutError, estimate_query_cost, execute_raw_sql_page, limit_sql
 
-def execute_sql(sql: str):
+COST_GUARD_MODES = {"off", "reject", "limit"}
+
+
+class CostGuardRejection(Exception):
+    pass
+
+
+def _apply_cost_guard(sql: str, guard: dict) -> tuple[str, int | None]:
+    """Return (sql to run, guard row limit or None); raise CostGuardRejection for rejected plans."""
+    mode = SPTS_SQL_COST_GUARD_MODE if SPTS_SQL_COST_GUARD_MODE in COST_GUARD_MODES else "off"
+    guard["cost_guard"] = mode
+    if mode == "off":
+        return sql, None
+
+    try:
+        estimate = estimate_query_cost(sql)
+    except QueryTimeoutError:
+        estimate = {"method": "explain_timeout", "estimated_cost": float("inf")}
+    except Exception as e:
+        # Unplannable SQL fails properly at execution; the guard only judges cost.
+        guard["action"] = "skipped"
+        guard["reason"] = f"explain failed: {e}"
+        return sql, None
+
+    if estimate is None:
+        guard["action"] = "skipped"
+        guard["reason"] = "dialect has no supported EXPLAIN cost"
+        return sql, None
+
+    guard.update(estimate)
+    if estimate["estimated_cost"] <= SPTS_SQL_COST_GUARD_MAX_COST:
+        guard["action"] = "allowed"
+        return sql, None
+
+    if mode == "reject":
+        guard["action"] = "rejected"
+        raise CostGuardRejection(
+            f"Query rejected by cost guard: estimated cost {estimate['estimated_cost']:.0f} "
+            f"exceeds {SPTS_SQL_COST_GUARD_MAX_COST:.0f}."
+        )
+
+    guard["action"] = "limited"
+    guard["row_limit"] = SPTS_SQL_COST_GUARD_LIMIT_ROWS
+    return limit_sql(sql, SPTS_SQL_COST_GUARD_LIMIT_ROWS), SPTS_SQL_COST_GUARD_LIMIT_ROWS
+
+
+def execute_sql(sql: str, offset: int = 0):
+    """
+    Execute read-only SQL under the statement timeout. The first page also passes the
+    optional cost guard; continuation pages reuse SQL that already passed it.
+    The returned "guard" block is surfaced in the /query rationale.
+    """
+    guard = {"statement_timeout_ms": SPTS_SQL_STATEMENT_TIMEOUT_MS, "timed_out": False}
     try:
-        result = execute_raw_sql(sql)
-        return {"success": True, "data": result}
+        run_sql, row_limit = (sql, None) if offset else _apply_cost_guard(sql, guard)
+        rows, has_more = execute_raw_sql_page(run_sql, offset=offset)
+        if row_limit is not None:
+            # The guard's LIMIT is final: report truncation but offer no continuation past it.
+            truncated = has_more or len(rows) >= row_limit
+            has_more = False
+        else:
+            truncated = has_more
+        return {
+            "success": True,
+            "data": rows,
+            "offset": offset,
+            "truncated": truncated,
+            "next_offset": offset + len(rows) if has_more else None,
+            "guard": guard,
+        }
+    except QueryTimeoutError as e:
+        guard["timed_out"] = True
+        return {"success": False, "error": str(e), "guard": guard}
     except Exception as e:
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e), "guard": guard}
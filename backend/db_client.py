@@ -1,48 +1,414 @@
+import json
+import math
+import os
+import re
+import time
+from contextlib import contextmanager
 from functools import lru_cache
+from threading import RLock
 
-from sqlalchemy import MetaData, String, Table, create_engine, func, inspect, select, text
+import sqlglot
+from sqlalchemy import MetaData, String, Table, create_engine, event, func, inspect, literal_column, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlglot import exp
 
 try:
-    from .config import get_main_database_url
+    from .config import (
+        SPTS_DB_CONNECT_TIMEOUT_SECONDS,
+        SPTS_DB_MAX_OVERFLOW,
+        SPTS_DB_POOL_PRE_PING,
+        SPTS_DB_POOL_RECYCLE_SECONDS,
+        SPTS_DB_POOL_SIZE,
+        SPTS_DB_POOL_TIMEOUT_SECONDS,
+        SPTS_PG_KEEPALIVES_IDLE_SECONDS,
+        SPTS_RESULT_FETCH_BATCH_SIZE,
+        SPTS_RESULT_ROW_CAP,
+        SPTS_SQL_STATEMENT_TIMEOUT_MS,
+        SPTS_SQLITE_IMMUTABLE,
+        SPTS_SQLITE_MMAP_SIZE,
+        get_main_database_url,
+    )
     from .sanitizer import sanitize_sql, SecurityViolationError, _sqlglot_dialect
 except ImportError:
-    from config import get_main_database_url
+    from config import (
+        SPTS_DB_CONNECT_TIMEOUT_SECONDS,
+        SPTS_DB_MAX_OVERFLOW,
+        SPTS_DB_POOL_PRE_PING,
+        SPTS_DB_POOL_RECYCLE_SECONDS,
+        SPTS_DB_POOL_SIZE,
+        SPTS_DB_POOL_TIMEOUT_SECONDS,
+        SPTS_PG_KEEPALIVES_IDLE_SECONDS,
+        SPTS_RESULT_FETCH_BATCH_SIZE,
+        SPTS_RESULT_ROW_CAP,
+        SPTS_SQL_STATEMENT_TIMEOUT_MS,
+        SPTS_SQLITE_IMMUTABLE,
+        SPTS_SQLITE_MMAP_SIZE,
+        get_main_database_url,
+    )
     from sanitizer import sanitize_sql, SecurityViolationError, _sqlglot_dialect
 
+# SQLite virtual-machine instructions between deadline checks.
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a statement runs past SPTS_SQL_STATEMENT_TIMEOUT_MS and is interrupted."""
+
+
+def _sqlite_engine_options(url) -> tuple:
+    """(url, connect_args, pragmas, is_memory) for a SQLite target."""
+    database = str(url.database or "")
+    is_memory = not database or database == ":memory:" or str(url.query.get("mode", "")).lower() == "memory"
+    # Pooled connections are handed to whichever worker thread asks next.
+    connect_args = {"check_same_thread": False, "timeout": SPTS_DB_CONNECT_TIMEOUT_SECONDS}
+    pragmas = []
+
+    read_only = str(url.query.get("mode", "")).lower() == "ro"
+    if read_only and not is_memory:
+        if SPTS_SQLITE_MMAP_SIZE > 0:
+            pragmas.append(f"PRAGMA mmap_size = {int(SPTS_SQLITE_MMAP_SIZE)}")
+        if SPTS_SQLITE_IMMUTABLE and str(url.query.get("uri", "")).lower() == "true":
+            url = url.update_query_dict({"immutable": "1"})
+    return url, connect_args, pragmas, is_memory
+
+
+def create_database_engine(database_url: str):
+    """
+    Engine with the configured pool sizing, pre-ping policy and dialect-specific
+    connect arguments. Shared by the main query engine and evaluation targets.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    options = {"pool_pre_ping": SPTS_DB_POOL_PRE_PING}
+    pragmas = []
+
+    if backend == "sqlite":
+        url, connect_args, pragmas, is_memory = _sqlite_engine_options(url)
+        options["connect_args"] = connect_args
+        if not is_memory:
+            options["pool_size"] = max(1, SPTS_DB_POOL_SIZE)
+            options["max_overflow"] = max(0, SPTS_DB_MAX_OVERFLOW)
+            options["pool_timeout"] = SPTS_DB_POOL_TIMEOUT_SECONDS
+    else:
+        options["pool_size"] = max(1, SPTS_DB_POOL_SIZE)
+        options["max_overflow"] = max(0, SPTS_DB_MAX_OVERFLOW)
+        options["pool_timeout"] = SPTS_DB_POOL_TIMEOUT_SECONDS
+        options["pool_recycle"] = SPTS_DB_POOL_RECYCLE_SECONDS
+        if backend == "postgresql":
+            options["connect_args"] = {
+                "connect_timeout": SPTS_DB_CONNECT_TIMEOUT_SECONDS,
+                "keepalives": 1,
+                "keepalives_idle": SPTS_PG_KEEPALIVES_IDLE_SECONDS,
+                "keepalives_interval": 10,
+                "keepalives_count": 5,
+            }
+        elif backend == "mysql":
+            options["connect_args"] = {"connect_timeout": SPTS_DB_CONNECT_TIMEOUT_SECONDS}
+
+    engine = create_engine(url, **options)
+
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, _connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+    return engine
+
 
 @lru_cache(maxsize=1)
 def get_main_engine():
-    return create_engine(get_main_database_url(), pool_pre_ping=True)
+    return create_database_engine(get_main_database_url())
 
 
 def get_main_dialect_name() -> str:
     return get_main_engine().dialect.name
 
 
-def execute_raw_sql(sql: str):
+def _is_timeout_error(error: DBAPIError, dialect_name: str) -> bool:
+    orig = getattr(error, "orig", None)
+    message = str(orig or error).lower()
+    if dialect_name == "sqlite":
+        return "interrupted" in message
+    if dialect_name == "postgresql":
+        return getattr(orig, "pgcode", None) == "57014" or "statement timeout" in message
+    return False
+
+
+@contextmanager
+def _statement_timeout(conn, timeout_ms: int | None = None):
+    """
+    Bound every statement run on conn inside the block. Yields the wall-clock deadline
+    (None when disabled) so long fetch loops can check it between batches.
+    """
+    timeout_ms = SPTS_SQL_STATEMENT_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    if timeout_ms <= 0:
+        yield None
+        return
+
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    dialect_name = conn.dialect.name
+    sqlite_connection = None
+    if dialect_name == "sqlite":
+        raw_connection = conn.connection
+        sqlite_connection = getattr(raw_connection, "driver_connection", None) or raw_connection.connection
+        sqlite_connection.set_progress_handler(
+            lambda: 1 if time.monotonic() > deadline else 0, SQLITE_PROGRESS_STEPS
+        )
+    elif dialect_name == "postgresql":
+        # SET LOCAL dies with the transaction, so the pooled connection is left untouched.
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+    try:
+        yield deadline
+    except DBAPIError as e:
+        if _is_timeout_error(e, dialect_name):
+            raise QueryTimeoutError(f"Query exceeded the {timeout_ms} ms statement timeout.") from e
+        raise
+    finally:
+        if sqlite_connection is not None:
+            sqlite_connection.set_progress_handler(None, 0)
+
+
+def _check_deadline(deadline: float | None, timeout_ms: int):
+    if deadline is not None and time.monotonic() > deadline:
+        raise QueryTimeoutError(f"Query exceeded the {timeout_ms} ms statement timeout.")
+
+
+def execute_raw_sql_page(sql: str, offset: int = 0, limit: int | None = None) -> tuple[list[tuple], bool]:
+    """
+    Rows [offset, offset + limit) of a read-only query and whether more rows follow.
+    Results are streamed (server-side cursor where the driver supports one) and read
+    in fetchmany batches, so at most limit + 1 rows are ever held per call. Earlier
+    pages are skipped batch by batch rather than rewriting the statement, so every
+    page runs exactly the SQL the caller was shown. Raises QueryTimeoutError when the
+    statement (including fetching) outlives SPTS_SQL_STATEMENT_TIMEOUT_MS.
+    """
+    limit = SPTS_RESULT_ROW_CAP if limit is None else limit
+    limit = max(1, limit)
+    offset = max(0, offset)
+    batch_size = max(1, SPTS_RESULT_FETCH_BATCH_SIZE)
+
     dialect = _sqlglot_dialect(get_main_dialect_name())
     safe_sql = sanitize_sql(sql, dialect=dialect)
     engine = get_main_engine()
-    with engine.connect() as conn:
-        result = conn.execute(text(safe_sql))
-        if result.returns_rows:
-            return [tuple(row) for row in result.fetchall()]
-        raise SecurityViolationError("Only row-returning read-only queries are permitted.")
+    with engine.connect() as conn, _statement_timeout(conn) as deadline:
+        result = conn.execution_options(stream_results=True).execute(text(safe_sql))
+        if not result.returns_rows:
+            raise SecurityViolationError("Only row-returning read-only queries are permitted.")
+
+        try:
+            skipped = 0
+            while skipped < offset:
+                _check_deadline(deadline, SPTS_SQL_STATEMENT_TIMEOUT_MS)
+                batch = result.fetchmany(min(batch_size, offset - skipped))
+                if not batch:
+                    return [], False
+                skipped += len(batch)
+
+            rows = []
+            # One row past the page tells us whether a continuation exists.
+            while len(rows) <= limit:
+                _check_deadline(deadline, SPTS_SQL_STATEMENT_TIMEOUT_MS)
+                batch = result.fetchmany(min(batch_size, limit + 1 - len(rows)))
+                if not batch:
+                    break
+                rows.extend(tuple(row) for row in batch)
+        finally:
+            result.close()
+
+    has_more = len(rows) > limit
+    return rows[:limit], has_more
+
+
+def execute_raw_sql(sql: str):
+    """First SPTS_RESULT_ROW_CAP rows of a read-only query."""
+    rows, _ = execute_raw_sql_page(sql)
+    return rows
+
+
+def probe_sql_executes(sql: str) -> bool:
+    """Cheap execution check: the sanitized statement is planned and run under LIMIT 0, returning no rows."""
+    try:
+        dialect = _sqlglot_dialect(get_main_dialect_name())
+        safe_sql = sanitize_sql(sql, dialect=dialect).strip().rstrip(";")
+        probe = f"SELECT * FROM ({safe_sql}) AS spts_probe LIMIT 0"
+        with get_main_engine().connect() as conn, _statement_timeout(conn):
+            conn.execute(text(probe)).fetchall()
+        return True
+    except Exception:
+        return False
+
+
+def limit_sql(sql: str, row_limit: int) -> str:
+    """Sanitized sql wrapped so the database stops producing rows after row_limit."""
+    dialect = _sqlglot_dialect(get_main_dialect_name())
+    safe_sql = sanitize_sql(sql, dialect=dialect).strip().rstrip(";")
+    return f"SELECT * FROM ({safe_sql}) AS spts_guard LIMIT {max(1, int(row_limit))}"
+
+
+def _postgres_plan_cost(conn, safe_sql: str) -> dict:
+    raw_plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {safe_sql}")).scalar_one()
+    plan = json.loads(raw_plan) if isinstance(raw_plan, str) else raw_plan
+    root = plan[0]["Plan"]
+    return {
+        "method": "postgresql_explain",
+        "estimated_cost": float(root.get("Total Cost", 0.0)),
+        "estimated_rows": float(root.get("Plan Rows", 0.0)),
+    }
+
+
+def _sqlite_table_rows(conn, table_name: str) -> int:
+    """
+    Row estimate for the cost guard, cached until the next schema invalidation so the
+    guard never adds a table scan per query. Prefers ANALYZE statistics (sqlite_stat1)
+    and counts the table once only when they are missing.
+    """
+    with _schema_cache_lock:
+        if table_name in _row_estimates:
+            return _row_estimates[table_name]
+
+    rows = None
+    try:
+        stat = conn.execute(
+            text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"), {"table": table_name}
+        ).scalar()
+        if stat:
+            rows = int(str(stat).split()[0])
+    except Exception:
+        pass  # No ANALYZE run yet: sqlite_stat1 does not exist.
+
+    if rows is None:
+        table = _reflect_table(table_name)
+        rows = int(conn.execute(select(func.count()).select_from(table)).scalar_one() or 0)
+
+    with _schema_cache_lock:
+        _row_estimates[table_name] = rows
+    return rows
+
+
+def _sqlite_plan_cost(conn, safe_sql: str) -> dict:
+    """
+    SQLite's planner exposes no costs, so estimate nested-loop work as the product of
+    the row counts of every table it scans in full (an unindexed or cartesian join
+    multiplies them). SCAN steps count even through a covering index; index searches
+    are treated as cheap.
+    """
+    plan_rows = conn.execute(text(f"EXPLAIN QUERY PLAN {safe_sql}")).fetchall()
+    known_tables = {name.lower(): name for name in list_user_tables()}
+    # The plan names tables by alias ("SCAN a1"), so map aliases back to tables.
+    for table in sqlglot.parse_one(safe_sql, read="sqlite").find_all(exp.Table):
+        if table.name.lower() in known_tables:
+            known_tables.setdefault(table.alias_or_name.lower(), known_tables[table.name.lower()])
+
+    full_scans = []
+    for row in plan_rows:
+        detail = str(row[-1])
+        match = re.match(r"SCAN (?:TABLE )?(\S+)", detail)
+        if match:
+            full_scans.append(match.group(1).strip('"`[]'))
+
+    scanned_rows = []
+    for name in full_scans:
+        table_name = known_tables.get(name.lower())
+        if table_name is None:
+            continue  # Subquery, CTE or constant row: no cheap estimate.
+        scanned_rows.append(_sqlite_table_rows(conn, table_name))
+
+    estimated_cost = float(math.prod(max(1, count) for count in scanned_rows)) if scanned_rows else 0.0
+    return {
+        "method": "sqlite_scan_product",
+        "estimated_cost": estimated_cost,
+        "full_scans": full_scans,
+    }
+
+
+def estimate_query_cost(sql: str) -> dict | None:
+    """
+    Planner cost estimate for a read-only query without running it, or None when
+    the dialect has no supported EXPLAIN form.
+    """
+    dialect_name = get_main_dialect_name()
+    if dialect_name not in {"postgresql", "sqlite"}:
+        return None
+
+    safe_sql = sanitize_sql(sql, dialect=_sqlglot_dialect(dialect_name)).strip().rstrip(";")
+    with get_main_engine().connect() as conn, _statement_timeout(conn):
+        if dialect_name == "postgresql":
+            return _postgres_plan_cost(conn, safe_sql)
+        return _sqlite_plan_cost(conn, safe_sql)
+
+
+# Process-wide schema metadata cache. Every caller shares one reflected MetaData
+# and one set of inspector results until invalidate_schema_cache() is called
+# (scheduled VLKG refresh or the admin endpoint).
+_schema_cache_lock = RLock()
+_schema_metadata = MetaData()
+_inspection_cache: dict[tuple, list] = {}
+_row_estimates: dict[str, int] = {}
+_schema_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_schema_generation = 0
+
+
+def _cached_inspection(key: tuple, loader) -> list:
+    with _schema_cache_lock:
+        if key in _inspection_cache:
+            _schema_cache_stats["hits"] += 1
+            return list(_inspection_cache[key])
+        _schema_cache_stats["misses"] += 1
+
+    value = loader(inspect(get_main_engine()))
+    with _schema_cache_lock:
+        _inspection_cache[key] = value
+    return list(value)
+
+
+def invalidate_schema_cache() -> None:
+    """Drop all cached reflection/inspection results so the next call re-reads the catalog."""
+    global _schema_metadata, _schema_generation
+    with _schema_cache_lock:
+        _schema_metadata = MetaData()
+        _inspection_cache.clear()
+        _row_estimates.clear()
+        _schema_cache_stats["invalidations"] += 1
+        _schema_generation += 1
+
+
+def get_schema_generation() -> int:
+    """Monotonic counter bumped on every invalidation; lets derived caches detect schema reloads."""
+    with _schema_cache_lock:
+        return _schema_generation
+
+
+def get_schema_cache_stats() -> dict:
+    with _schema_cache_lock:
+        return {
+            **_schema_cache_stats,
+            "generation": _schema_generation,
+            "reflected_tables": len(_schema_metadata.tables),
+            "cached_inspections": len(_inspection_cache),
+        }
 
 
 def list_user_tables() -> list[str]:
-    inspector = inspect(get_main_engine())
-    return inspector.get_table_names()
+    return _cached_inspection(("tables",), lambda inspector: inspector.get_table_names())
 
 
 def get_table_columns(table_name: str) -> list[dict]:
-    inspector = inspect(get_main_engine())
-    return inspector.get_columns(table_name)
+    return _cached_inspection(
+        ("columns", table_name), lambda inspector: inspector.get_columns(table_name)
+    )
 
 
 def get_table_foreign_keys(table_name: str) -> list[dict]:
-    inspector = inspect(get_main_engine())
-    return inspector.get_foreign_keys(table_name)
+    return _cached_inspection(
+        ("foreign_keys", table_name), lambda inspector: inspector.get_foreign_keys(table_name)
+    )
 
 
 def is_textual_column_type(type_obj) -> bool:
@@ -54,9 +420,25 @@ def is_textual_column_type(type_obj) -> bool:
 
 
 def _reflect_table(table_name: str) -> Table:
-    engine = get_main_engine()
-    metadata = MetaData()
-    return Table(table_name, metadata, autoload_with=engine)
+    with _schema_cache_lock:
+        table = _schema_metadata.tables.get(table_name)
+        if table is not None:
+            _schema_cache_stats["hits"] += 1
+            return table
+        _schema_cache_stats["misses"] += 1
+        metadata = _schema_metadata
+
+    # Reflect into a private MetaData without holding the lock, so one slow catalog
+    # round trip never blocks lookups of other tables or the cost guard.
+    reflected = Table(table_name, MetaData(), autoload_with=get_main_engine())
+
+    with _schema_cache_lock:
+        if metadata is not _schema_metadata:
+            return reflected  # Invalidated meanwhile: don't publish into the new cache.
+        table = _schema_metadata.tables.get(table_name)
+        if table is None:
+            table = reflected.to_metadata(_schema_metadata)
+        return table
 
 
 def count_distinct_non_null(table_name: str, column_name: str) -> int:
@@ -77,6 +459,38 @@ def fetch_distinct_non_null_values(table_name: str, column_name: str, limit: int
     return [row[0] for row in rows]
 
 
+def fetch_top_distinct_values(table_name: str, column_name: str, limit: int) -> list:
+    """Most frequent non-null values first (ties broken by value for stable rebuilds)."""
+    table = _reflect_table(table_name)
+    column = table.c[column_name]
+    frequency = func.count().label("frequency")
+    stmt = (
+        select(column, frequency)
+        .where(column.is_not(None))
+        .group_by(column)
+        .order_by(frequency.desc(), column)
+        .limit(limit)
+    )
+    with get_main_engine().connect() as conn:
+        rows = conn.execute(stmt).fetchall()
+    return [row[0] for row in rows]
+
+
+def iter_distinct_non_null_values(table_name: str, column_name: str, chunk_size: int):
+    """Stream every distinct non-null value in chunks without materializing the column."""
+    table = _reflect_table(table_name)
+    column = table.c[column_name]
+    # Ordered so chunked enumeration and seeded sampling are repeatable across runs.
+    stmt = select(column).where(column.is_not(None)).distinct().order_by(column)
+    with get_main_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(stmt)
+        while True:
+            rows = result.fetchmany(max(1, chunk_size))
+            if not rows:
+                break
+            yield [row[0] for row in rows]
+
+
 def table_has_column(table_name: str, column_name: str) -> bool:
     try:
         table = _reflect_table(table_name)
@@ -112,3 +526,60 @@ def value_exists_in_column(table_name: str, column_name: str, value: str) -> boo
         return int(count or 0) > 0
     except Exception:
         return False
+
+
+def get_sqlite_file_signature() -> str | None:
+    """Cheap whole-database change signal for SQLite: size/mtime of the file and its WAL."""
+    engine = get_main_engine()
+    if engine.dialect.name != "sqlite":
+        return None
+
+    database = str(engine.url.database or "")
+    if database.lower().startswith("file:"):
+        database = database[5:]
+    if not database or database == ":memory:" or not os.path.exists(database):
+        return None
+
+    parts = []
+    for path in (database, f"{database}-wal"):
+        if os.path.exists(path):
+            stat_result = os.stat(path)
+            parts.append(f"{stat_result.st_size}:{stat_result.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def get_table_change_signals(tables: list[str] | None = None) -> dict[str, str]:
+    """
+    Per-table change signals used for incremental VLKG refresh.
+    PostgreSQL reads cumulative tuple counters from pg_stat_user_tables in one query;
+    other dialects use row count, plus max(rowid) on SQLite.
+    """
+    engine = get_main_engine()
+    table_names = list(tables) if tables is not None else list_user_tables()
+
+    if engine.dialect.name == "postgresql":
+        stmt = text(
+            "SELECT relname, n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables "
+            "WHERE schemaname = current_schema()"
+        )
+        with engine.connect() as conn:
+            rows = conn.execute(stmt).fetchall()
+        stats = {row[0]: f"ins={row[1]};upd={row[2]};del={row[3]}" for row in rows}
+        return {table_name: stats.get(table_name, "") for table_name in table_names}
+
+    signals = {}
+    with engine.connect() as conn:
+        for table_name in table_names:
+            table = _reflect_table(table_name)
+            row_count = conn.execute(select(func.count()).select_from(table)).scalar_one()
+            signal = f"count={row_count}"
+            if engine.dialect.name == "sqlite":
+                try:
+                    max_rowid = conn.execute(
+                        select(func.max(literal_column("rowid"))).select_from(table)
+                    ).scalar()
+                    signal += f";max_rowid={max_rowid}"
+                except Exception:
+                    conn.rollback()  # WITHOUT ROWID tables: row count only.
+            signals[table_name] = signal
+    return signals
@@ -1,18 +1,38 @@
 import hashlib
-import math
+import json
+import os
 import threading
+from collections import OrderedDict
 
+import numpy as np
 from fastembed import TextEmbedding
 
 try:
-    from .config import EMBEDDING_MODEL, FALLBACK_EMBEDDING_DIM
+    from .config import (
+        EMBEDDING_MODEL,
+        FALLBACK_EMBEDDING_DIM,
+        SPTS_EMBEDDING_CACHE_DIR,
+        SPTS_EMBEDDING_CACHE_SIZE,
+    )
 except ImportError:
-    from config import EMBEDDING_MODEL, FALLBACK_EMBEDDING_DIM
+    from config import (
+        EMBEDDING_MODEL,
+        FALLBACK_EMBEDDING_DIM,
+        SPTS_EMBEDDING_CACHE_DIR,
+        SPTS_EMBEDDING_CACHE_SIZE,
+    )
 
 _model = None
 _model_error = None
 _model_lock = threading.Lock()
 
+_cache_lock = threading.Lock()
+_cache: OrderedDict = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0, "loaded_entries": 0}
+_cache_loaded = False
+_CACHE_VECTORS_FILE = "embeddings.npy"
+_CACHE_KEYS_FILE = "keys.json"
+
 
 def _load_model():
     global _model, _model_error
@@ -44,29 +64,150 @@ def _load_model():
     return _model
 
 
+def _fallback_embeddings_batch(texts: list, dim: int = FALLBACK_EMBEDDING_DIM):
+    """
+    Deterministic hash embeddings for many texts at once.
+
+    Each vector is the big-endian uint32 stream of sha256(f"{text}|{counter}")
+    digests mapped to [-1, 1] and L2-normalized. The squared norm is summed
+    left to right (cumsum) rather than pairwise, so results are bit-identical
+    to the original scalar implementation and existing collections stay valid.
+    """
+    if not texts:
+        return []
+
+    digests_per_text = -(-dim // 8)  # 8 uint32 values per 32-byte digest
+    suffixes = [str(counter).encode("utf-8") for counter in range(digests_per_text)]
+    digests = []
+    for text in texts:
+        prefix = f"{text}|".encode("utf-8")
+        digests.extend(hashlib.sha256(prefix + suffix).digest() for suffix in suffixes)
+
+    integers = np.frombuffer(b"".join(digests), dtype=">u4").reshape(len(texts), digests_per_text * 8)
+    values = (integers[:, :dim].astype(np.float64) / 4294967295.0) * 2.0 - 1.0
+
+    norms = np.sqrt(np.cumsum(values * values, axis=1)[:, -1])
+    safe_norms = np.where(norms > 0, norms, 1.0)
+    return (values / safe_norms[:, None]).tolist()
+
+
 def _fallback_embedding(text: str, dim: int = FALLBACK_EMBEDDING_DIM):
     if not text:
         return None
+    return _fallback_embeddings_batch([text], dim)[0]
+
+
+def _fallback_source() -> str:
+    return f"fallback:{FALLBACK_EMBEDDING_DIM}"
+
+
+def _cache_key(source: str, text: str) -> str:
+    # Keyed on the exact text that is embedded, so a hit always returns that text's vector.
+    return f"{source}|{text}"
+
+
+def _load_cache_from_disk():
+    """Populate the LRU from the persisted key index, with vectors mmap'd rather than read eagerly."""
+    global _cache_loaded
+    if _cache_loaded:
+        return
+    _cache_loaded = True
+
+    if not SPTS_EMBEDDING_CACHE_DIR:
+        return
+
+    vectors_path = os.path.join(SPTS_EMBEDDING_CACHE_DIR, _CACHE_VECTORS_FILE)
+    keys_path = os.path.join(SPTS_EMBEDDING_CACHE_DIR, _CACHE_KEYS_FILE)
+    if not (os.path.exists(vectors_path) and os.path.exists(keys_path)):
+        return
+
+    try:
+        with open(keys_path, "r", encoding="utf-8") as f:
+            keys = json.load(f)
+        vectors = np.load(vectors_path, mmap_mode="r")
+        if vectors.ndim != 2 or len(keys) != vectors.shape[0]:
+            print("Warning: embedding cache on disk is inconsistent. Ignoring it.")
+            return
+        first_row = max(0, len(keys) - SPTS_EMBEDDING_CACHE_SIZE)
+        for row in range(first_row, len(keys)):
+            _cache[keys[row]] = vectors[row]
+        _cache_stats["loaded_entries"] = len(_cache)
+        print(f"Loaded {len(_cache)} cached embeddings from {SPTS_EMBEDDING_CACHE_DIR}.")
+    except Exception as e:
+        print(f"Warning: could not load embedding cache: {e}")
+
+
+def _cache_get(key: str):
+    with _cache_lock:
+        _load_cache_from_disk()
+        vector = _cache.get(key)
+        if vector is None:
+            _cache_stats["misses"] += 1
+            return None
+        _cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+def _cache_put(key: str, vector):
+    if vector is None or len(vector) == 0 or SPTS_EMBEDDING_CACHE_SIZE <= 0:
+        return
+    # float32 arrays take a fraction of the memory of float lists; _cache_get converts back.
+    vector = np.asarray(vector, dtype=np.float32)
+    with _cache_lock:
+        _cache[key] = vector
+        _cache.move_to_end(key)
+        while len(_cache) > SPTS_EMBEDDING_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def save_embedding_cache() -> bool:
+    """Persist the LRU to SPTS_EMBEDDING_CACHE_DIR (float32 matrix + JSON key index)."""
+    if not SPTS_EMBEDDING_CACHE_DIR:
+        return False
+
+    with _cache_lock:
+        items = list(_cache.items())
+    if not items:
+        return False
+
+    dims = {len(vector) for _, vector in items}
+    if len(dims) != 1:
+        # Mixed dimensions (e.g. model and fallback entries) cannot share one matrix.
+        dim = len(items[-1][1])
+        items = [(key, vector) for key, vector in items if len(vector) == dim]
+
+    try:
+        os.makedirs(SPTS_EMBEDDING_CACHE_DIR, exist_ok=True)
+        vectors_path = os.path.join(SPTS_EMBEDDING_CACHE_DIR, _CACHE_VECTORS_FILE)
+        keys_path = os.path.join(SPTS_EMBEDDING_CACHE_DIR, _CACHE_KEYS_FILE)
+        matrix = np.asarray([vector for _, vector in items], dtype=np.float32)
+
+        with open(f"{vectors_path}.tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(f"{keys_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump([key for key, _ in items], f)
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        os.replace(f"{keys_path}.tmp", keys_path)
+        return True
+    except Exception as e:
+        print(f"Warning: could not persist embedding cache: {e}")
+        return False
+
+
+def get_embedding_cache_stats() -> dict:
+    with _cache_lock:
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            "size": len(_cache),
+            "capacity": SPTS_EMBEDDING_CACHE_SIZE,
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "hit_rate": round(_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "loaded_entries": _cache_stats["loaded_entries"],
+            "persistent": bool(SPTS_EMBEDDING_CACHE_DIR),
+        }
 
-    values = []
-    counter = 0
-    while len(values) < dim:
-        digest = hashlib.sha256(f"{text}|{counter}".encode("utf-8")).digest()
-        for index in range(0, len(digest), 4):
-            chunk = digest[index:index + 4]
-            if len(chunk) < 4:
-                continue
-            integer = int.from_bytes(chunk, byteorder="big", signed=False)
-            values.append((integer / 4294967295.0) * 2.0 - 1.0)
-            if len(values) >= dim:
-                break
-        counter += 1
-
-    norm = math.sqrt(sum(value * value for value in values))
-    if norm > 0:
-        values = [value / norm for value in values]
-
-    return values
 
 def get_embedding(text: str):
     """
@@ -83,35 +224,62 @@ def get_embedding(text: str):
         return None
 
     model = _load_model()
+    source = EMBEDDING_MODEL if model is not None else _fallback_source()
+    cached = _cache_get(_cache_key(source, text_value))
+    if cached is not None:
+        return cached
+
     if model is None:
-        return _fallback_embedding(text_value)
+        embedding = _fallback_embedding(text_value)
+        _cache_put(_cache_key(source, text_value), embedding)
+        return embedding
 
     try:
-        embedding = next(model.embed([text_value]))
-        return embedding.tolist()
+        embedding = next(model.embed([text_value])).tolist()
+        _cache_put(_cache_key(source, text_value), embedding)
+        return embedding
     except Exception as e:
         print(f"Error generating embedding for '{text}': {e}")
         return _fallback_embedding(text_value)
 
-def get_embeddings_batch(texts: list):
+def get_embeddings_batch(texts: list, use_cache: bool = True):
     """
     Efficiently generates embeddings for a list of strings at once.
     Highly recommended when profiling large databases.
+    use_cache=False bypasses the query-time LRU (VLKG builds embed every alias
+    once, which would only evict hot query entities).
     """
     cleaned_texts = [str(item).strip() for item in texts if str(item).strip()]
     if not cleaned_texts:
         return []
 
     model = _load_model()
+    source = EMBEDDING_MODEL if model is not None else _fallback_source()
+    if use_cache:
+        results = [_cache_get(_cache_key(source, item)) for item in cleaned_texts]
+    else:
+        results = [None] * len(cleaned_texts)
+    missing = [index for index, vector in enumerate(results) if vector is None]
+    if not missing:
+        return results
+
+    missing_texts = [cleaned_texts[index] for index in missing]
     if model is None:
-        return [_fallback_embedding(item) for item in cleaned_texts]
+        computed = _fallback_embeddings_batch(missing_texts)
+    else:
+        try:
+            computed = [embedding.tolist() for embedding in model.embed(missing_texts)]
+        except Exception as e:
+            print(f"Error generating batch embeddings: {e}")
+            for index, embedding in zip(missing, _fallback_embeddings_batch(missing_texts)):
+                results[index] = embedding
+            return results
 
-    try:
-        embeddings = list(model.embed(cleaned_texts))
-        return [embedding.tolist() for embedding in embeddings]
-    except Exception as e:
-        print(f"Error generating batch embeddings: {e}")
-        return [_fallback_embedding(item) for item in cleaned_texts]
+    for index, embedding in zip(missing, computed):
+        results[index] = embedding
+        if use_cache:
+            _cache_put(_cache_key(source, cleaned_texts[index]), embedding)
+    return results
 
 # --- Quick Test Block ---
 if __name__ == "__main__":
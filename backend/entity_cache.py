@@ -0,0 +1,174 @@
+"""
+entity_cache.py
+---------------
+TTL/LRU cache of LLM entity extractions, keyed by normalized query text,
+model name and prompt version.
+
+Saved dashboard questions are re-run many times a day; a hit skips the 70B
+extraction call in grounding.extract_entities. Entries live in a bounded
+in-memory LRU and, when SPTS_ENTITY_CACHE_PATH is set, in a SQLite table so
+they survive restarts and are shared between workers.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    from .config import (
+        SPTS_ENTITY_CACHE_ENABLED,
+        SPTS_ENTITY_CACHE_PATH,
+        SPTS_ENTITY_CACHE_SIZE,
+        SPTS_ENTITY_CACHE_TTL_SECONDS,
+    )
+except ImportError:
+    from config import (
+        SPTS_ENTITY_CACHE_ENABLED,
+        SPTS_ENTITY_CACHE_PATH,
+        SPTS_ENTITY_CACHE_SIZE,
+        SPTS_ENTITY_CACHE_TTL_SECONDS,
+    )
+
+_cache_lock = Lock()
+# cache_key -> (stored_at, entities)
+_cache: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0}
+_store_initialized = False
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a question."""
+    text = " ".join(str(query or "").split()).casefold()
+    return re.sub(r"[\s?.!]+$", "", text)
+
+
+def _cache_key(query: str, model: str, prompt_version: str) -> str:
+    seed = f"{model}|{prompt_version}|{normalize_query(query)}"
+    return hashlib.sha256(seed.encode("utf-8")).hexdigest()
+
+
+def _is_fresh(stored_at: float) -> bool:
+    return SPTS_ENTITY_CACHE_TTL_SECONDS <= 0 or time.time() - stored_at < SPTS_ENTITY_CACHE_TTL_SECONDS
+
+
+def _init_store():
+    global _store_initialized
+    if _store_initialized:
+        return
+
+    os.makedirs(os.path.dirname(SPTS_ENTITY_CACHE_PATH), exist_ok=True)
+    with sqlite3.connect(SPTS_ENTITY_CACHE_PATH, timeout=10) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entity_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                normalized_query TEXT NOT NULL,
+                entities TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+        ''')
+        if SPTS_ENTITY_CACHE_TTL_SECONDS > 0:
+            conn.execute(
+                "DELETE FROM entity_cache WHERE stored_at < ?",
+                (time.time() - SPTS_ENTITY_CACHE_TTL_SECONDS,),
+            )
+        conn.commit()
+    _store_initialized = True
+
+
+def _remember(cache_key: str, stored_at: float, entities: list[str]):
+    with _cache_lock:
+        _cache[cache_key] = (stored_at, entities)
+        _cache.move_to_end(cache_key)
+        while len(_cache) > max(1, SPTS_ENTITY_CACHE_SIZE):
+            _cache.popitem(last=False)
+
+
+def _load_from_store(cache_key: str):
+    try:
+        _init_store()
+        with sqlite3.connect(SPTS_ENTITY_CACHE_PATH, timeout=10) as conn:
+            row = conn.execute(
+                "SELECT entities, stored_at FROM entity_cache WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+    except Exception as e:
+        print(f"[entity_cache] Warning: lookup failed: {e}")
+        return None
+
+    if row is None or not _is_fresh(row[1]):
+        return None
+    return row[1], json.loads(row[0])
+
+
+def get_cached_entities(query: str, model: str, prompt_version: str):
+    """Return the cached LLM entity list for this question, or None on a miss."""
+    if not SPTS_ENTITY_CACHE_ENABLED:
+        return None
+
+    cache_key = _cache_key(query, model, prompt_version)
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached is not None and not _is_fresh(cached[0]):
+            del _cache[cache_key]
+            cached = None
+        if cached is not None:
+            _cache.move_to_end(cache_key)
+            _cache_stats["hits"] += 1
+            return list(cached[1])
+
+    if SPTS_ENTITY_CACHE_PATH:
+        stored = _load_from_store(cache_key)
+        if stored is not None:
+            _remember(cache_key, stored[0], stored[1])
+            with _cache_lock:
+                _cache_stats["hits"] += 1
+            return list(stored[1])
+
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+    return None
+
+
+def store_entities(query: str, model: str, prompt_version: str, entities: list[str]):
+    if not SPTS_ENTITY_CACHE_ENABLED:
+        return
+
+    cache_key = _cache_key(query, model, prompt_version)
+    stored_at = time.time()
+    entities = [str(entity) for entity in entities if isinstance(entity, str)]
+    _remember(cache_key, stored_at, entities)
+
+    if not SPTS_ENTITY_CACHE_PATH:
+        return
+
+    try:
+        _init_store()
+        with sqlite3.connect(SPTS_ENTITY_CACHE_PATH, timeout=10) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entity_cache "
+                "(cache_key, model, normalized_query, entities, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (cache_key, model, normalize_query(query), json.dumps(entities), stored_at),
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"[entity_cache] Warning: write failed: {e}")
+
+
+def get_entity_cache_stats() -> dict:
+    with _cache_lock:
+        hits = _cache_stats["hits"]
+        misses = _cache_stats["misses"]
+        return {
+            "enabled": SPTS_ENTITY_CACHE_ENABLED,
+            "size": len(_cache),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "persistent": bool(SPTS_ENTITY_CACHE_PATH),
+        }
@@ -0,0 +1,188 @@
+"""
+fuzzy_index.py
+--------------
+In-memory character-trigram index over the VLKG's canonical values and aliases.
+
+Grounding consults it before the embedding model and Chroma, so typos and
+abbreviations that already exist as stored aliases ("Alamda", "LA Unified")
+resolve with a few dictionary lookups. Entries are loaded from the live VLKG
+collection with a paged scan at startup and after every VLKG build or delta.
+Similarity is the Dice coefficient of padded trigram sets (pg_trgm style).
+"""
+
+import time
+from collections import Counter
+from threading import Lock
+
+try:
+    from .config import SPTS_FUZZY_INDEX_ENABLED, SPTS_FUZZY_MIN_SIMILARITY
+except ImportError:
+    from config import SPTS_FUZZY_INDEX_ENABLED, SPTS_FUZZY_MIN_SIMILARITY
+
+PAGE_SIZE = 1000
+
+_index_lock = Lock()
+# Entry: (normalized alias, canonical, table, column, trigram count)
+_entries: list[tuple[str, str, str, str, int]] = []
+_postings: dict[str, list[int]] = {}
+_entry_keys: set[tuple[str, str, str, str]] = set()
+_index_ready = False
+_last_build = {
+    "build_ms": 0,
+    "error": None,
+}
+
+
+def normalize_text(value) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).lower().split())
+
+
+def trigrams(value) -> set[str]:
+    """Padded character trigrams: two leading spaces and one trailing space per word."""
+    grams = set()
+    for word in normalize_text(value).split():
+        padded = f"  {word} "
+        for start in range(len(padded) - 2):
+            grams.add(padded[start:start + 3])
+    return grams
+
+
+def trigram_similarity(left, right) -> float:
+    left_grams = trigrams(left)
+    right_grams = trigrams(right)
+    if not left_grams or not right_grams:
+        return 0.0
+    return 2.0 * len(left_grams & right_grams) / (len(left_grams) + len(right_grams))
+
+
+def _add_entry(entries, postings, keys, alias, canonical, table, column) -> bool:
+    alias_norm = normalize_text(alias)
+    if not alias_norm or not canonical or not table or not column:
+        return False
+
+    key = (alias_norm, canonical, table, column)
+    if key in keys:
+        return False
+
+    grams = trigrams(alias_norm)
+    if not grams:
+        return False
+
+    entry_id = len(entries)
+    entries.append((alias_norm, canonical, table, column, len(grams)))
+    keys.add(key)
+    for gram in grams:
+        postings.setdefault(gram, []).append(entry_id)
+    return True
+
+
+def build_fuzzy_index(collection) -> bool:
+    """Load every (alias, canonical, table, column) from the VLKG and atomically swap in a fresh index."""
+    global _entries, _postings, _entry_keys, _index_ready
+
+    if not SPTS_FUZZY_INDEX_ENABLED or collection is None:
+        return False
+
+    start_time = time.time()
+    entries: list[tuple[str, str, str, str, int]] = []
+    postings: dict[str, list[int]] = {}
+    keys: set[tuple[str, str, str, str]] = set()
+
+    try:
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+            documents = page.get("documents") or []
+            metadatas = page.get("metadatas") or []
+            if not metadatas:
+                break
+
+            for document, meta in zip(documents, metadatas):
+                if not meta:
+                    continue
+                canonical = str(meta.get("canonical", "") or "")
+                table = str(meta.get("table", "") or "")
+                column = str(meta.get("column", "") or "")
+                _add_entry(entries, postings, keys, document, canonical, table, column)
+                _add_entry(entries, postings, keys, canonical, canonical, table, column)
+
+            if len(metadatas) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+    except Exception as e:
+        print(f"[fuzzy_index] Warning: fuzzy index build failed: {e}")
+        with _index_lock:
+            _last_build["error"] = str(e)
+        return False
+
+    with _index_lock:
+        _entries = entries
+        _postings = postings
+        _entry_keys = keys
+        _index_ready = True
+        _last_build["build_ms"] = round((time.time() - start_time) * 1000, 2)
+        _last_build["error"] = None
+
+    print(f"[fuzzy_index] Indexed {len(entries)} aliases ({len(postings)} trigrams).")
+    return True
+
+
+def add_alias(alias, canonical, table, column):
+    """Register a mapping learned at runtime (e.g. an LLM fallback upsert) without a rebuild."""
+    with _index_lock:
+        if _index_ready:
+            _add_entry(_entries, _postings, _entry_keys, alias, canonical, table, column)
+
+
+def search(value, limit: int = 5, min_similarity: float | None = None) -> list[dict]:
+    """
+    Best lexical candidates for value, one per (canonical, table, column),
+    ordered by trigram similarity. Each candidate carries the matched alias.
+    """
+    if min_similarity is None:
+        min_similarity = SPTS_FUZZY_MIN_SIMILARITY
+
+    query_grams = trigrams(value)
+    if not query_grams:
+        return []
+
+    with _index_lock:
+        if not _index_ready:
+            return []
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(_postings.get(gram, ()))
+
+        best: dict[tuple[str, str, str], dict] = {}
+        for entry_id, overlap in shared.items():
+            alias_norm, canonical, table, column, gram_count = _entries[entry_id]
+            similarity = 2.0 * overlap / (len(query_grams) + gram_count)
+            if similarity < min_similarity:
+                continue
+            key = (canonical, table, column)
+            current = best.get(key)
+            if current is None or similarity > current["similarity"]:
+                best[key] = {
+                    "alias": alias_norm,
+                    "canonical": canonical,
+                    "table": table,
+                    "column": column,
+                    "similarity": similarity,
+                }
+
+    ranked = sorted(best.values(), key=lambda item: (-item["similarity"], item["canonical"]))
+    return ranked[:max(1, limit)]
+
+
+def get_fuzzy_index_status() -> dict:
+    with _index_lock:
+        return {
+            "enabled": SPTS_FUZZY_INDEX_ENABLED,
+            "ready": _index_ready,
+            "aliases": len(_entries),
+            "trigrams": len(_postings),
+            "build_ms": _last_build["build_ms"],
+            "error": _last_build["error"],
+        }
@@ -1,31 +1,36 @@
 import json
 import uuid
 import re
-import time
-from threading import Lock
 import chromadb
-from groq import Groq, RateLimitError, APITimeoutError
 
 try:
-    from .embedding_util import get_embedding
-    from .config import CHROMA_PATH, API_KEY, GROQ_API_KEYS
+    from .embedding_util import get_embeddings_batch
+    from .config import CHROMA_PATH, SPTS_FUZZY_TOKEN_SIMILARITY
+    from .llm_gateway import chat_completion, configured_api_keys
+    from . import fuzzy_index
+    from .entity_cache import get_cached_entities, store_entities
     from .db_client import (
         list_user_tables,
         get_table_columns,
         table_has_column,
-        value_exists_in_column,
         is_textual_column_type,
+        value_exists_in_column,
     )
+    from .value_index import is_value_index_ready, lookup_value, value_in_column
 except ImportError:
-    from embedding_util import get_embedding
-    from config import CHROMA_PATH, API_KEY, GROQ_API_KEYS
+    from embedding_util import get_embeddings_batch
+    from config import CHROMA_PATH, SPTS_FUZZY_TOKEN_SIMILARITY
+    from llm_gateway import chat_completion, configured_api_keys
+    import fuzzy_index
+    from entity_cache import get_cached_entities, store_entities
     from db_client import (
         list_user_tables,
         get_table_columns,
         table_has_column,
-        value_exists_in_column,
         is_textual_column_type,
+        value_exists_in_column,
     )
+    from value_index import is_value_index_ready, lookup_value, value_in_column
 
 print("Initializing ChromaDB connection in grounding...")
 chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
@@ -43,6 +48,20 @@ def _connect_collection():
         return False
 
 
+def _activate_collection(new_collection):
+    """Point grounding at a freshly swapped-in VLKG collection."""
+    global collection
+    collection = new_collection
+    fuzzy_index.build_fuzzy_index(new_collection)
+
+
+def refresh_fuzzy_index() -> bool:
+    """Reload the lexical alias index after the VLKG changed in place (delta runs)."""
+    if not collection and not _connect_collection():
+        return False
+    return fuzzy_index.build_fuzzy_index(collection)
+
+
 def _bootstrap_collection_if_missing():
     global collection
     if collection:
@@ -55,16 +74,48 @@ def _bootstrap_collection_if_missing():
     try:
         from kg.build_vlkg import build_graph
 
-        build_graph()
+        build_graph(on_swap=_activate_collection)
     except Exception as e:
         print(f"VLKG bootstrap failed: {e}")
         return False
 
-    return _connect_collection()
+    return collection is not None or _connect_collection()
 
 
 def ensure_vlkg_ready():
-    return _bootstrap_collection_if_missing()
+    ready = _bootstrap_collection_if_missing()
+    if ready and not fuzzy_index.get_fuzzy_index_status()["ready"]:
+        fuzzy_index.build_fuzzy_index(collection)
+    return ready
+
+
+def rebuild_vlkg() -> bool:
+    """Rebuild the VLKG in a shadow collection; grounding keeps serving the old one until the swap."""
+    try:
+        from kg.build_vlkg import build_graph
+
+        return build_graph(on_swap=_activate_collection) is not None
+    except Exception as e:
+        print(f"VLKG rebuild failed: {e}")
+        return False
+
+
+def _query_collection(query_embeddings, n_results):
+    """Query the VLKG, reconnecting once if the collection was swapped by another process."""
+    try:
+        return collection.query(query_embeddings=query_embeddings, n_results=n_results)
+    except Exception as e:
+        print(f"VLKG query failed ({e}). Reconnecting to the live collection...")
+        if not _connect_collection():
+            return {}
+        return collection.query(query_embeddings=query_embeddings, n_results=n_results)
+
+
+def get_vlkg_version() -> str:
+    """Identifier of the live VLKG collection; every rebuild swaps in a collection with a new id."""
+    if not collection and not _connect_collection():
+        return ""
+    return str(getattr(collection, "id", "") or "")
 
 
 def get_vlkg_status() -> dict:
@@ -175,7 +226,18 @@ def _has_token_overlap(entity: str, canonical: str) -> bool:
     return len(ent_tokens.intersection(can_tokens)) > 0
 
 
-def _is_plausible_vector_mapping(entity: str, canonical: str, distance: float) -> bool:
+def _has_fuzzy_token_overlap(entity: str, text: str) -> bool:
+    """Token overlap that tolerates misspellings of longer words."""
+    ent_tokens = [token for token in _tokenize(entity) if len(token) >= 4 and token not in _GENERIC_ENTITY_TOKENS]
+    text_tokens = [token for token in _tokenize(text) if len(token) >= 4]
+    return any(
+        fuzzy_index.trigram_similarity(ent_token, text_token) >= SPTS_FUZZY_TOKEN_SIMILARITY
+        for ent_token in ent_tokens
+        for text_token in text_tokens
+    )
+
+
+def _is_plausible_vector_mapping(entity: str, canonical: str, distance: float, matched_alias: str | None = None) -> bool:
     if distance > 0.50:
         return False
 
@@ -196,6 +258,14 @@ def _is_plausible_vector_mapping(entity: str, canonical: str, distance: float) -
     if canonical_acronym and canonical_acronym in entity_tokens:
         return True
 
+    # Lexical tier: the entity hit a stored alias of this canonical value,
+    # either verbatim (e.g. a generated abbreviation) or as a close misspelling.
+    if matched_alias is not None:
+        if _norm_text(matched_alias).lower() == entity_norm:
+            return True
+        if _has_fuzzy_token_overlap(entity, matched_alias) or _has_fuzzy_token_overlap(entity, canonical):
+            return True
+
     return False
 
 
@@ -395,7 +465,7 @@ def _rule_based_query_mappings(query: str) -> list[dict]:
 
     county_matches = re.findall(r"county(?:\s+of)?\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)", query_text)
     for county_name in county_matches:
-        if value_exists_in_column("schools", "County", county_name):
+        if value_in_column("schools", "County", county_name):
             rules.append(_make_exact_mapping(county_name, county_name, "schools", "County"))
 
     if "between" in query_lower and "county" in query_lower:
@@ -403,35 +473,35 @@ def _rule_based_query_mappings(query: str) -> list[dict]:
         for place in place_matches:
             if place.lower() in {"between", "which", "indicate"}:
                 continue
-            if value_exists_in_column("schools", "County", place):
+            if value_in_column("schools", "County", place):
                 rules.append(_make_exact_mapping(place, place, "schools", "County"))
 
     grade_span_match = re.search(r"kindergarten\s+to\s+(\d+)(?:st|nd|rd|th)\s+grade", query_lower)
     if grade_span_match:
         canonical = f"K-{grade_span_match.group(1)}"
-        if value_exists_in_column("schools", "GSserved", canonical):
+        if value_in_column("schools", "GSserved", canonical):
             rules.append(_make_exact_mapping("Kindergarten to grade span", canonical, "schools", "GSserved"))
 
     ownership_match = re.search(r"ownership code\s+(\d+)", query_lower)
     if ownership_match:
         ownership_code = ownership_match.group(1)
-        if value_exists_in_column("schools", "SOC", ownership_code):
+        if value_in_column("schools", "SOC", ownership_code):
             rules.append(_make_exact_mapping(f"ownership code {ownership_code}", ownership_code, "schools", "SOC"))
 
     admin_match = re.search(r"first name is\s+([A-Za-z]+)", query_text, re.IGNORECASE)
     if admin_match:
         admin_name = admin_match.group(1)
-        if value_exists_in_column("schools", "AdmFName1", admin_name):
+        if value_in_column("schools", "AdmFName1", admin_name):
             rules.append(_make_exact_mapping(admin_name, admin_name, "schools", "AdmFName1"))
 
-    if "does not offer physical building" in query_lower and value_exists_in_column("schools", "Virtual", "F"):
+    if "does not offer physical building" in query_lower and value_in_column("schools", "Virtual", "F"):
         rules.append(_make_exact_mapping("does not offer physical building", "F", "schools", "Virtual"))
 
     return _dedupe_mappings(rules)
 
 
-def _direct_exact_schema_mapping(query: str, entity: str) -> dict | None:
-    candidates = []
+def _textual_schema_columns() -> list[tuple[str, str]]:
+    columns = []
     for table in list_user_tables():
         for column in get_table_columns(table):
             column_name = str(column.get("name", "") or "")
@@ -440,11 +510,30 @@ def _direct_exact_schema_mapping(query: str, entity: str) -> dict | None:
                 continue
             if column_type is not None and not is_textual_column_type(column_type):
                 continue
-            if not _column_context_compatible(query, column_name):
-                continue
-            if value_exists_in_column(table, column_name, entity):
-                score = 1.0 + _column_context_score(query, column_name)
-                candidates.append((score, table, column_name))
+            columns.append((table, column_name))
+    return columns
+
+
+def _direct_exact_schema_mapping(query: str, entity: str) -> dict | None:
+    # One inverted-index probe yields every column holding the entity. Live checks
+    # of every textual column only happen while the index is disabled or unbuilt.
+    if not str(entity or "").strip():
+        return None
+    if is_value_index_ready():
+        locations = lookup_value(entity)
+    else:
+        locations = [
+            (table, column_name)
+            for table, column_name in _textual_schema_columns()
+            if _column_context_compatible(query, column_name)
+            and value_exists_in_column(table, column_name, entity)
+        ]
+
+    candidates = []
+    for table, column_name in locations:
+        if _column_context_compatible(query, column_name):
+            score = 1.0 + _column_context_score(query, column_name)
+            candidates.append((score, table, column_name))
 
     if not candidates:
         return None
@@ -456,85 +545,15 @@ def _direct_exact_schema_mapping(query: str, entity: str) -> dict | None:
 
 _connect_collection()
 
-_groq_clients = []
-_groq_rotation_index = 0
-_groq_client_lock = Lock()
-
 
-def _configured_api_keys():
-    keys = [key.strip() for key in (GROQ_API_KEYS or []) if key and key.strip()]
-    if keys:
-        return keys
-    if API_KEY and API_KEY.strip():
-        return [API_KEY.strip()]
-    return []
-
-
-def _ensure_groq_clients():
-    global _groq_clients
-    if _groq_clients:
-        return _groq_clients
-
-    for key in _configured_api_keys():
-        try:
-            _groq_clients.append(Groq(api_key=key))
-        except Exception as e:
-            print(f"Warning: failed to initialize Groq client in grounding: {e}")
-            continue
-
-    return _groq_clients
-
-
-def _acquire_next_client():
-    global _groq_rotation_index
-    with _groq_client_lock:
-        clients = _ensure_groq_clients()
-        if not clients:
-            return None, -1
-
-        current_index = _groq_rotation_index % len(clients)
-        _groq_rotation_index = (_groq_rotation_index + 1) % len(clients)
-        return clients[current_index], current_index
-
-
-def _is_retryable_groq_error(error: Exception) -> bool:
-    if isinstance(error, (RateLimitError, APITimeoutError)):
-        return True
-
-    error_text = str(error).lower()
-    retryable_markers = (
-        "rate limit",
-        "too many requests",
-        "429",
-        "quota",
-        "timeout",
-        "timed out",
-        "overloaded",
-    )
-    return any(marker in error_text for marker in retryable_markers)
-
-
-def _groq_completion_with_failover(create_completion, attempts_per_key=2):
-    clients = _ensure_groq_clients()
-    if not clients:
+def _chat_completion_or_none(**kwargs):
+    """Grounding treats an unavailable LLM as "no answer" rather than an error."""
+    try:
+        completion, _ = chat_completion(**kwargs)
+        return completion
+    except Exception:
         return None
 
-    total_attempts = max(1, len(clients) * max(1, attempts_per_key))
-
-    for attempt in range(total_attempts):
-        client, _ = _acquire_next_client()
-        if client is None:
-            break
-
-        try:
-            return create_completion(client)
-        except Exception as error:
-            if not _is_retryable_groq_error(error):
-                return None
-            time.sleep(min(0.3 * (attempt + 1), 1.5))
-
-    return None
-
 
 def get_mini_schema():
     """Fetches a lightweight schema for the fallback LLM."""
@@ -546,13 +565,41 @@ def get_mini_schema():
     return schema_str
 
 
-def extract_entities(query: str):
-    if not _configured_api_keys():
+ENTITY_EXTRACTION_MODEL = "llama-3.3-70b-versatile"
+# Bump when the extraction prompt changes so cached extractions are not reused.
+ENTITY_PROMPT_VERSION = "v1"
+
+
+def extract_entities(query: str, details: dict | None = None):
+    """
+    details, if given, receives an 'entity_extraction' entry describing how the
+    entities were obtained (LLM call, cache hit, or regex patterns only).
+    """
+    if details is None:
+        details = {}
+
+    if not configured_api_keys():
+        details["entity_extraction"] = {"source": "patterns_only", "cache_hit": False}
         return _clean_entities(_extract_domain_patterns(query))
 
     # First, extract domain-specific patterns (grade ranges, etc.) to avoid LLM false negatives
     domain_entities = _extract_domain_patterns(query)
-    
+
+    cached_entities = get_cached_entities(query, ENTITY_EXTRACTION_MODEL, ENTITY_PROMPT_VERSION)
+    if cached_entities is not None:
+        details["entity_extraction"] = {
+            "source": "cache",
+            "cache_hit": True,
+            "model": ENTITY_EXTRACTION_MODEL,
+        }
+        return _clean_entities(domain_entities + cached_entities)
+
+    details["entity_extraction"] = {
+        "source": "llm",
+        "cache_hit": False,
+        "model": ENTITY_EXTRACTION_MODEL,
+    }
+
     prompt = f"""
     Extract ONLY the specific, categorical data values or proper nouns from this user query that need to be matched against database rows.
     
@@ -574,20 +621,22 @@ def extract_entities(query: str):
     Output ONLY a JSON object with a list of strings under the key 'entities'.
     """
     try:
-        resp = _groq_completion_with_failover(
-            lambda client: client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                response_format={"type": "json_object"},
-            )
+        resp = _chat_completion_or_none(
+            model=ENTITY_EXTRACTION_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            response_format={"type": "json_object"},
         )
         if resp is None:
+            details["entity_extraction"]["source"] = "patterns_only"
             return _clean_entities(domain_entities)
         llm_entities = json.loads(resp.choices[0].message.content).get("entities", [])
+        if isinstance(llm_entities, list):
+            store_entities(query, ENTITY_EXTRACTION_MODEL, ENTITY_PROMPT_VERSION, llm_entities)
         combined = domain_entities + llm_entities
         return _clean_entities(combined)
     except Exception:
+        details["entity_extraction"]["source"] = "patterns_only"
         return _clean_entities(domain_entities)
 
 
@@ -628,7 +677,7 @@ def _extract_domain_patterns(query: str):
 
 def lightweight_fallback_search(entity: str):
     """Uses a fast, lightweight model to guess the canonical value if vector search fails."""
-    if not _configured_api_keys():
+    if not configured_api_keys():
         return None, None, None
 
     schema = get_mini_schema()
@@ -641,13 +690,11 @@ def lightweight_fallback_search(entity: str):
     Output ONLY a JSON object with keys: 'canonical', 'table', 'column', 'confidence_score' (1-100).
     """
     try:
-        resp = _groq_completion_with_failover(
-            lambda client: client.chat.completions.create(
-                model="llama-3.1-8b-instant",  # Lightweight, fast, cost-effective model
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                response_format={"type": "json_object"},
-            )
+        resp = _chat_completion_or_none(
+            model="llama-3.1-8b-instant",  # Lightweight, fast, cost-effective model
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            response_format={"type": "json_object"},
         )
         if resp is None:
             return None, None, None
@@ -659,17 +706,167 @@ def lightweight_fallback_search(entity: str):
         return None, None, None
 
 
-def ground_query(query: str):
+def _select_lexical_candidate(query: str, entity: str):
+    """Resolve an entity from the trigram alias index before any embedding or Chroma call."""
+    selected = None
+    for candidate in fuzzy_index.search(entity):
+        canonical_value = candidate["canonical"]
+        candidate_column = candidate["column"]
+
+        if canonical_value.lower() == entity.lower():
+            continue
+
+        if not _column_context_compatible(query, candidate_column):
+            continue
+
+        distance = 1.0 - candidate["similarity"]
+        if _is_plausible_vector_mapping(entity, canonical_value, distance, matched_alias=candidate["alias"]):
+            adjusted_distance = distance - _column_context_score(query, candidate_column)
+            if selected is None or adjusted_distance < selected[0]:
+                selected = (adjusted_distance, distance, candidate)
+
+    if selected is None:
+        return None
+
+    _, distance, candidate = selected
+    return {
+        "original": entity,
+        "grounded": candidate["canonical"],
+        "table": candidate["table"],
+        "column": candidate["column"],
+        "distance": round(distance, 4),
+        "type": "Lexical Fuzzy Match",
+    }
+
+
+def _select_vector_candidate(query: str, entity: str, distances: list, metadatas: list):
+    """Pick the first plausible semantic match among the top-k Chroma candidates for one entity."""
+    selected = None
+    for candidate_distance, metadata in zip(distances or [], metadatas or []):
+        canonical_value = _norm_text(metadata.get("canonical"))
+        candidate_column = _norm_text(metadata.get("column"))
+        if not canonical_value:
+            continue
+
+        if canonical_value.lower() == entity.lower():
+            continue
+
+        if not _column_context_compatible(query, candidate_column):
+            continue
+
+        if _is_plausible_vector_mapping(entity, canonical_value, candidate_distance):
+            adjusted_distance = candidate_distance - _column_context_score(query, candidate_column)
+            if selected is None or adjusted_distance < selected[0]:
+                selected = (adjusted_distance, candidate_distance, metadata)
+
+    if selected is None:
+        return None
+
+    _, distance, metadata = selected
+    return {
+        "original": entity,
+        "grounded": metadata["canonical"],
+        "table": metadata["table"],
+        "column": metadata["column"],
+        "distance": round(distance, 4),
+        "type": "Vector Semantic Match",
+    }
+
+
+def _llm_fallback_mapping(query: str, entity: str, query_embedding, known_tables: set):
+    # DYNAMIC FALLBACK: Vector failed, trigger lightweight LLM
+    print(f"Vector search failed for '{entity}'. Triggering LLM Fallback...")
+    canonical, table, column = lightweight_fallback_search(entity)
+
+    if not (canonical and table and column):
+        return None
+
+    canonical = _norm_text(canonical)
+    table = _norm_text(table)
+    column = _norm_text(column)
+
+    if table not in known_tables:
+        print(
+            f"Skipped fallback mapping for '{entity}': unknown table '{table}'."
+        )
+        return None
+
+    if not table_has_column(table, column):
+        print(
+            f"Skipped fallback mapping for '{entity}': unknown column '{table}.{column}'."
+        )
+        return None
+
+    if not _column_context_compatible(query, column):
+        print(
+            f"Skipped fallback mapping for '{entity}': column '{table}.{column}' conflicts with query context."
+        )
+        return None
+
+    if not _is_plausible_fallback_mapping(entity, canonical):
+        print(
+            f"Skipped fallback mapping for '{entity}': canonical '{canonical}' is weakly related."
+        )
+        return None
+
+    is_exact_match = value_in_column(table, column, canonical)
+
+    if not is_exact_match:
+        print(
+            f"Skipped fallback hint for '{entity}': '{canonical}' is not an exact value in {table}.{column}."
+        )
+        return None
+    else:
+        print(f"Exact Mapping: Found '{canonical}' in {table}.{column}.")
+
+    mapping = {
+        "original": entity,
+        "grounded": canonical,
+        "table": table,
+        "column": column,
+        "distance": 0.0,
+        "type": "LLM Fallback (Exact)"
+        if is_exact_match
+        else "LLM Fallback (Hint)",
+    }
+
+    if is_exact_match:
+        collection.upsert(
+            documents=[entity],
+            embeddings=[query_embedding],
+            metadatas=[
+                {"canonical": canonical, "table": table, "column": column}
+            ],
+            ids=[_mapping_id(entity, canonical, table, column)],
+        )
+        fuzzy_index.add_alias(entity, canonical, table, column)
+        print(
+            f"Dynamically updated VLKG with new exact mapping: {entity} -> {canonical}"
+        )
+
+    return mapping
+
+
+def ground_query(query: str, details: dict | None = None):
+    """
+    Returns (query, mappings). details, if given, is filled with grounding
+    diagnostics (e.g. entity extraction cache hits) for the rationale.
+    """
     if not collection and not _bootstrap_collection_if_missing():
         return query, []
 
     applied_mappings = _rule_based_query_mappings(query)
-    entities = extract_entities(query)
+    entities = extract_entities(query, details)
     known_tables = set(list_user_tables())
 
     pre_mapped_entities = {str(mapping.get("original", "")).lower() for mapping in applied_mappings}
 
-    for entity in entities:
+    # Mappings are collected per entity and appended in extraction order at the end,
+    # so batching the vector stage does not reorder hints passed to SQL generation.
+    entity_mappings: dict[int, dict] = {}
+    unresolved: list[tuple[int, str]] = []
+
+    for position, entity in enumerate(entities):
         if entity.lower() in pre_mapped_entities:
             continue
 
@@ -678,118 +875,45 @@ def ground_query(query: str):
 
         direct_exact = _direct_exact_schema_mapping(query, entity)
         if direct_exact is not None:
-            applied_mappings.append(direct_exact)
+            entity_mappings[position] = direct_exact
             continue
 
-        query_embedding = get_embedding(entity)
-        if not query_embedding:
+        lexical = _select_lexical_candidate(query, entity)
+        if lexical is not None:
+            entity_mappings[position] = lexical
             continue
 
-        # Query top-k candidates and select the first plausible semantic match.
-        results = collection.query(query_embeddings=[query_embedding], n_results=3)
+        unresolved.append((position, entity))
 
-        candidates = []
-        if results.get("distances") and results.get("metadatas"):
-            candidates = list(zip(results["distances"][0], results["metadatas"][0]))
+    if unresolved:
+        # One embedding pass and one Chroma round trip for every unresolved entity.
+        embeddings = get_embeddings_batch([entity for _, entity in unresolved])
+        if len(embeddings) != len(unresolved):
+            embeddings = []
 
-        selected = None
-        for candidate_distance, metadata in candidates:
-            canonical_value = _norm_text(metadata.get("canonical"))
-            candidate_column = _norm_text(metadata.get("column"))
-            if not canonical_value:
-                continue
+        results = {}
+        if embeddings:
+            results = _query_collection(embeddings, n_results=3)
 
-            if canonical_value.lower() == entity.lower():
-                continue
+        all_distances = results.get("distances") or []
+        all_metadatas = results.get("metadatas") or []
 
-            if not _column_context_compatible(query, candidate_column):
+        for batch_index, (position, entity) in enumerate(unresolved):
+            query_embedding = embeddings[batch_index] if embeddings else None
+            if not query_embedding:
                 continue
 
-            if _is_plausible_vector_mapping(entity, canonical_value, candidate_distance):
-                adjusted_distance = candidate_distance - _column_context_score(query, candidate_column)
-                if selected is None or adjusted_distance < selected[0]:
-                    selected = (adjusted_distance, candidate_distance, metadata)
-
-        if selected is not None:
-            _, distance, metadata = selected
-            applied_mappings.append(
-                {
-                    "original": entity,
-                    "grounded": metadata["canonical"],
-                    "table": metadata["table"],
-                    "column": metadata["column"],
-                    "distance": round(distance, 4),
-                    "type": "Vector Semantic Match",
-                }
-            )
-        else:
-            # DYNAMIC FALLBACK: Vector failed, trigger lightweight LLM
-            print(f"Vector search failed for '{entity}'. Triggering LLM Fallback...")
-            canonical, table, column = lightweight_fallback_search(entity)
-
-            if canonical and table and column:
-                canonical = _norm_text(canonical)
-                table = _norm_text(table)
-                column = _norm_text(column)
-
-                if table not in known_tables:
-                    print(
-                        f"Skipped fallback mapping for '{entity}': unknown table '{table}'."
-                    )
-                    continue
-
-                if not table_has_column(table, column):
-                    print(
-                        f"Skipped fallback mapping for '{entity}': unknown column '{table}.{column}'."
-                    )
-                    continue
-
-                if not _column_context_compatible(query, column):
-                    print(
-                        f"Skipped fallback mapping for '{entity}': column '{table}.{column}' conflicts with query context."
-                    )
-                    continue
-
-                if not _is_plausible_fallback_mapping(entity, canonical):
-                    print(
-                        f"Skipped fallback mapping for '{entity}': canonical '{canonical}' is weakly related."
-                    )
-                    continue
-
-                is_exact_match = value_exists_in_column(table, column, canonical)
-
-                if not is_exact_match:
-                    print(
-                        f"Skipped fallback hint for '{entity}': '{canonical}' is not an exact value in {table}.{column}."
-                    )
-                    continue
-                else:
-                    print(f"Exact Mapping: Found '{canonical}' in {table}.{column}.")
-
-                applied_mappings.append(
-                    {
-                        "original": entity,
-                        "grounded": canonical,
-                        "table": table,
-                        "column": column,
-                        "distance": 0.0,
-                        "type": "LLM Fallback (Exact)"
-                        if is_exact_match
-                        else "LLM Fallback (Hint)",
-                    }
-                )
-
-                if is_exact_match:
-                    collection.upsert(
-                        documents=[entity],
-                        embeddings=[query_embedding],
-                        metadatas=[
-                            {"canonical": canonical, "table": table, "column": column}
-                        ],
-                        ids=[_mapping_id(entity, canonical, table, column)],
-                    )
-                    print(
-                        f"Dynamically updated VLKG with new exact mapping: {entity} -> {canonical}"
-                    )
+            # Query top-k candidates and select the first plausible semantic match.
+            distances = all_distances[batch_index] if batch_index < len(all_distances) else []
+            metadatas = all_metadatas[batch_index] if batch_index < len(all_metadatas) else []
+
+            mapping = _select_vector_candidate(query, entity, distances, metadatas)
+            if mapping is None:
+                mapping = _llm_fallback_mapping(query, entity, query_embedding, known_tables)
+            if mapping is not None:
+                entity_mappings[position] = mapping
+
+    for position in sorted(entity_mappings):
+        applied_mappings.append(entity_mappings[position])
 
     return query, _dedupe_mappings(applied_mappings)
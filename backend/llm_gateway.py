@@ -0,0 +1,415 @@
+"""
+llm_gateway.py
+--------------
+Process-wide gateway for every Groq chat completion (grounding, text_to_sql,
+build_vlkg and update_vlkg).
+
+All configured API keys share one pooled HTTP connection client, one view of
+each key's remaining request and token budget (refreshed from the
+x-ratelimit-* response headers) and one cooldown state, so a key throttled
+for one module is avoided by all of them. Every call is routed to the key
+with the most headroom; when no key can take a request the caller waits in
+a queue until a budget resets, a cooldown ends or an in-flight call finishes,
+instead of failing. Rate-limit and timeout errors put the offending key on
+cooldown (Retry-After when provided, exponential otherwise) and the call is
+retried on another key. Per-model latency and token histograms are kept for
+/admin/llm-gateway.
+"""
+
+import re
+import time
+from threading import Condition, Lock
+
+import httpx
+from groq import APITimeoutError, Groq, RateLimitError
+
+try:
+    from .config import (
+        API_KEY,
+        GROQ_API_KEYS,
+        SPTS_GROQ_COOLDOWN_SECONDS,
+        SPTS_GROQ_MAX_IN_FLIGHT_PER_KEY,
+        SPTS_GROQ_QUEUE_TIMEOUT_SECONDS,
+        SPTS_LLM_MAX_CONNECTIONS,
+        SPTS_LLM_MAX_KEEPALIVE_CONNECTIONS,
+    )
+except ImportError:
+    from config import (
+        API_KEY,
+        GROQ_API_KEYS,
+        SPTS_GROQ_COOLDOWN_SECONDS,
+        SPTS_GROQ_MAX_IN_FLIGHT_PER_KEY,
+        SPTS_GROQ_QUEUE_TIMEOUT_SECONDS,
+        SPTS_LLM_MAX_CONNECTIONS,
+        SPTS_LLM_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+MAX_COOLDOWN_SECONDS = 60.0
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class _KeyState:
+    def __init__(self, index: int, client):
+        self.index = index
+        self.client = client
+        self.limit_requests = None
+        self.remaining_requests = None
+        self.requests_reset_at = 0.0
+        self.limit_tokens = None
+        self.remaining_tokens = None
+        self.tokens_reset_at = 0.0
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.last_dispatch = 0.0
+        self.calls = 0
+        self.rate_limited = 0
+
+
+_pool_condition = Condition()
+_key_states: list[_KeyState] = []
+_pool_initialized = False
+_http_client = None
+
+_metrics_lock = Lock()
+_model_metrics: dict[str, dict] = {}
+
+
+def configured_api_keys() -> list[str]:
+    keys = [key.strip() for key in (GROQ_API_KEYS or []) if key and key.strip()]
+    if keys:
+        return keys
+    if API_KEY and API_KEY.strip():
+        return [API_KEY.strip()]
+    return []
+
+
+def _shared_http_client():
+    """One keep-alive connection pool to the Groq API, shared by the clients of every key."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max(1, SPTS_LLM_MAX_CONNECTIONS),
+                max_keepalive_connections=max(1, SPTS_LLM_MAX_KEEPALIVE_CONNECTIONS),
+            ),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+def _ensure_pool() -> list[_KeyState]:
+    global _pool_initialized
+    with _pool_condition:
+        if _pool_initialized:
+            return _key_states
+
+        http_client = _shared_http_client()
+        for key in configured_api_keys():
+            try:
+                _key_states.append(_KeyState(len(_key_states), Groq(api_key=key, http_client=http_client)))
+            except Exception as e:
+                print(f"Warning: failed to initialize Groq client: {e}")
+        _pool_initialized = True
+        return _key_states
+
+
+def _parse_duration(value) -> float | None:
+    """Parse Groq reset durations such as '7.66s', '2m59.56s' or '120ms' into seconds."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(text)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def _parse_int(value) -> int | None:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable_error(error: Exception) -> bool:
+    if isinstance(error, (RateLimitError, APITimeoutError)):
+        return True
+
+    error_text = str(error).lower()
+    retryable_markers = (
+        "rate limit",
+        "too many requests",
+        "429",
+        "quota",
+        "timeout",
+        "timed out",
+        "overloaded",
+    )
+    return any(marker in error_text for marker in retryable_markers)
+
+
+def _expire_budgets_locked(state: _KeyState, now: float):
+    # Once a window resets the last-seen budget is stale; treat it as unknown (full) again.
+    if state.remaining_requests is not None and now >= state.requests_reset_at:
+        state.remaining_requests = None
+    if state.remaining_tokens is not None and now >= state.tokens_reset_at:
+        state.remaining_tokens = None
+
+
+def _headroom(remaining, limit) -> float:
+    if remaining is None:
+        return 1.0
+    if not limit:
+        return 1.0 if remaining > 0 else 0.0
+    return max(0.0, remaining / limit)
+
+
+def _pick_key_locked(now: float):
+    best = None
+    best_rank = None
+    for state in _key_states:
+        _expire_budgets_locked(state, now)
+        if now < state.cooldown_until:
+            continue
+        if state.in_flight >= max(1, SPTS_GROQ_MAX_IN_FLIGHT_PER_KEY):
+            continue
+        if state.remaining_requests is not None and state.remaining_requests <= 0:
+            continue
+        if state.remaining_tokens is not None and state.remaining_tokens <= 0:
+            continue
+
+        score = min(
+            _headroom(state.remaining_requests, state.limit_requests),
+            _headroom(state.remaining_tokens, state.limit_tokens),
+        )
+        # Most headroom first, then fewest in-flight calls, then least recently used.
+        rank = (score, -state.in_flight, -state.last_dispatch)
+        if best_rank is None or rank > best_rank:
+            best, best_rank = state, rank
+    return best
+
+
+def _next_availability_locked(now: float) -> float:
+    """Seconds until some key may become usable again (bounded so waiters re-check regularly)."""
+    waits = []
+    for state in _key_states:
+        candidates = [state.cooldown_until]
+        if state.remaining_requests is not None and state.remaining_requests <= 0:
+            candidates.append(state.requests_reset_at)
+        if state.remaining_tokens is not None and state.remaining_tokens <= 0:
+            candidates.append(state.tokens_reset_at)
+        waits.append(max(candidates) - now)
+    positive = [wait for wait in waits if wait > 0]
+    return min(positive) if positive else 1.0
+
+
+def _acquire(deadline: float) -> _KeyState:
+    with _pool_condition:
+        while True:
+            now = time.monotonic()
+            state = _pick_key_locked(now)
+            if state is not None:
+                state.in_flight += 1
+                state.last_dispatch = now
+                state.calls += 1
+                if state.remaining_requests is not None:
+                    state.remaining_requests -= 1
+                return state
+
+            remaining_wait = deadline - now
+            if remaining_wait <= 0:
+                raise RuntimeError("All Groq API keys are rate limited; request queue timed out.")
+            _pool_condition.wait(min(remaining_wait, _next_availability_locked(now)))
+
+
+def _record_headers_locked(state: _KeyState, headers, now: float):
+    if not headers:
+        return
+
+    limit_requests = _parse_int(headers.get("x-ratelimit-limit-requests"))
+    remaining_requests = _parse_int(headers.get("x-ratelimit-remaining-requests"))
+    reset_requests = _parse_duration(headers.get("x-ratelimit-reset-requests"))
+    limit_tokens = _parse_int(headers.get("x-ratelimit-limit-tokens"))
+    remaining_tokens = _parse_int(headers.get("x-ratelimit-remaining-tokens"))
+    reset_tokens = _parse_duration(headers.get("x-ratelimit-reset-tokens"))
+
+    if limit_requests is not None:
+        state.limit_requests = limit_requests
+    if remaining_requests is not None:
+        state.remaining_requests = remaining_requests
+        state.requests_reset_at = now + (reset_requests or 60.0)
+    if limit_tokens is not None:
+        state.limit_tokens = limit_tokens
+    if remaining_tokens is not None:
+        state.remaining_tokens = remaining_tokens
+        state.tokens_reset_at = now + (reset_tokens or 60.0)
+
+
+def _release(state: _KeyState, headers=None, error: Exception | None = None):
+    with _pool_condition:
+        now = time.monotonic()
+        state.in_flight = max(0, state.in_flight - 1)
+        _record_headers_locked(state, headers, now)
+
+        if error is None:
+            state.consecutive_failures = 0
+        else:
+            state.consecutive_failures += 1
+            retry_after = _parse_duration((headers or {}).get("retry-after"))
+            if retry_after is None:
+                retry_after = min(
+                    SPTS_GROQ_COOLDOWN_SECONDS * (2 ** (state.consecutive_failures - 1)),
+                    MAX_COOLDOWN_SECONDS,
+                )
+            state.cooldown_until = max(state.cooldown_until, now + retry_after)
+            if isinstance(error, RateLimitError):
+                state.rate_limited += 1
+
+        _pool_condition.notify_all()
+
+
+def _empty_histogram(bounds) -> dict:
+    return {"bounds": list(bounds), "counts": [0] * (len(bounds) + 1), "sum": 0.0}
+
+
+def _observe(histogram: dict, value: float):
+    index = len(histogram["bounds"])
+    for position, bound in enumerate(histogram["bounds"]):
+        if value <= bound:
+            index = position
+            break
+    histogram["counts"][index] += 1
+    histogram["sum"] += value
+
+
+def _record_call(model: str, latency_ms: float, usage=None, error: Exception | None = None):
+    with _metrics_lock:
+        metrics = _model_metrics.get(model)
+        if metrics is None:
+            metrics = {
+                "calls": 0,
+                "errors": 0,
+                "rate_limited": 0,
+                "latency_ms": _empty_histogram(LATENCY_BUCKETS_MS),
+                "prompt_tokens": _empty_histogram(TOKEN_BUCKETS),
+                "completion_tokens": _empty_histogram(TOKEN_BUCKETS),
+            }
+            _model_metrics[model] = metrics
+
+        metrics["calls"] += 1
+        _observe(metrics["latency_ms"], latency_ms)
+        if error is not None:
+            metrics["errors"] += 1
+            if isinstance(error, RateLimitError):
+                metrics["rate_limited"] += 1
+        if usage is not None:
+            _observe(metrics["prompt_tokens"], float(getattr(usage, "prompt_tokens", 0) or 0))
+            _observe(metrics["completion_tokens"], float(getattr(usage, "completion_tokens", 0) or 0))
+
+
+def _error_headers(error: Exception):
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None)
+
+
+def _create_completion(client, kwargs: dict):
+    """Returns (completion, rate-limit headers)."""
+    completions = client.chat.completions
+    raw_api = getattr(completions, "with_raw_response", None)
+    if raw_api is None:
+        return completions.create(**kwargs), None
+    raw = raw_api.create(**kwargs)
+    return raw.parse(), raw.headers
+
+
+def chat_completion(attempts_per_key=2, **kwargs):
+    """
+    Create a chat completion on the key with the most headroom.
+    kwargs are passed to client.chat.completions.create. Retryable failures
+    cool the key down and move to another one; callers queue while every key
+    is exhausted. Returns (completion, key_index); raises the last error when
+    all attempts fail.
+    """
+    states = _ensure_pool()
+    if not states:
+        raise RuntimeError("Missing API_KEY/GROQ_API_KEY/GROQ_API_KEYS")
+
+    model = str(kwargs.get("model", "unknown"))
+    total_attempts = max(1, len(states) * max(1, attempts_per_key))
+    deadline = time.monotonic() + max(0.0, SPTS_GROQ_QUEUE_TIMEOUT_SECONDS)
+    last_error = None
+
+    for _ in range(total_attempts):
+        state = _acquire(deadline)
+        start_time = time.perf_counter()
+        try:
+            completion, headers = _create_completion(state.client, kwargs)
+        except Exception as error:
+            _record_call(model, (time.perf_counter() - start_time) * 1000, error=error)
+            last_error = error
+            if not _is_retryable_error(error):
+                _release(state, _error_headers(error))
+                break
+            _release(state, _error_headers(error), error)
+            continue
+
+        _record_call(model, (time.perf_counter() - start_time) * 1000, usage=getattr(completion, "usage", None))
+        _release(state, headers)
+        return completion, state.index
+
+    if last_error is not None:
+        raise last_error
+
+    raise RuntimeError("No available Groq clients")
+
+
+def get_gateway_status() -> dict:
+    """Per-key budgets and per-model call metrics (keys are identified by position only)."""
+    _ensure_pool()
+    with _pool_condition:
+        now = time.monotonic()
+        keys = []
+        for state in _key_states:
+            _expire_budgets_locked(state, now)
+            keys.append({
+                "key_index": state.index + 1,
+                "remaining_requests": state.remaining_requests,
+                "limit_requests": state.limit_requests,
+                "remaining_tokens": state.remaining_tokens,
+                "limit_tokens": state.limit_tokens,
+                "cooldown_seconds": round(max(0.0, state.cooldown_until - now), 2),
+                "in_flight": state.in_flight,
+                "calls": state.calls,
+                "rate_limited": state.rate_limited,
+            })
+
+    with _metrics_lock:
+        models = {}
+        for model, metrics in _model_metrics.items():
+            models[model] = {
+                "calls": metrics["calls"],
+                "errors": metrics["errors"],
+                "rate_limited": metrics["rate_limited"],
+                "avg_latency_ms": round(metrics["latency_ms"]["sum"] / metrics["calls"], 2) if metrics["calls"] else 0.0,
+                "latency_ms": {**metrics["latency_ms"], "counts": list(metrics["latency_ms"]["counts"])},
+                "prompt_tokens": {**metrics["prompt_tokens"], "counts": list(metrics["prompt_tokens"]["counts"])},
+                "completion_tokens": {**metrics["completion_tokens"], "counts": list(metrics["completion_tokens"]["counts"])},
+            }
+
+    return {
+        "keys": keys,
+        "models": models,
+        "http": {
+            "max_connections": SPTS_LLM_MAX_CONNECTIONS,
+            "max_keepalive_connections": SPTS_LLM_MAX_KEEPALIVE_CONNECTIONS,
+        },
+    }
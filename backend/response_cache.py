@@ -0,0 +1,124 @@
+"""
+response_cache.py
+-----------------
+Optional whole-request memoization for /query.
+
+Entries are keyed by the normalized question, the schema fingerprint and the
+live VLKG collection version, so a schema change or VLKG rebuild naturally
+misses. Generated SQL (with mappings and rationales) and execution results
+age separately: once the results TTL expires the cached SQL is re-executed
+without any LLM call, and once the SQL TTL expires the entry is dropped.
+The whole cache is cleared whenever a VLKG delta or schema invalidation runs.
+"""
+
+import copy
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    from .config import (
+        SPTS_RESPONSE_CACHE_ENABLED,
+        SPTS_RESPONSE_CACHE_RESULT_TTL_SECONDS,
+        SPTS_RESPONSE_CACHE_SIZE,
+        SPTS_RESPONSE_CACHE_SQL_TTL_SECONDS,
+    )
+    from .entity_cache import normalize_query
+except ImportError:
+    from config import (
+        SPTS_RESPONSE_CACHE_ENABLED,
+        SPTS_RESPONSE_CACHE_RESULT_TTL_SECONDS,
+        SPTS_RESPONSE_CACHE_SIZE,
+        SPTS_RESPONSE_CACHE_SQL_TTL_SECONDS,
+    )
+    from entity_cache import normalize_query
+
+RESULT_FIELDS = ("baseline_result", "baseline_result_page", "spts_result", "spts_result_page")
+
+_cache_lock = Lock()
+# cache_key -> {"response": dict, "sql_stored_at": float, "results_stored_at": float}
+_cache: OrderedDict[str, dict] = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0, "result_refreshes": 0, "invalidations": 0}
+
+
+def make_cache_key(query: str, schema_version: str, vlkg_version: str) -> str:
+    seed = f"{normalize_query(query)}|{schema_version}|{vlkg_version}"
+    return hashlib.sha256(seed.encode("utf-8")).hexdigest()
+
+
+def _age(stored_at: float) -> float:
+    return time.time() - stored_at
+
+
+def get_cached_response(cache_key: str):
+    """
+    Return (response, results_fresh) for a live entry, or None.
+    results_fresh is False when the SQL is still valid but its results must be re-executed.
+    """
+    if not SPTS_RESPONSE_CACHE_ENABLED:
+        return None
+
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is not None and _age(entry["sql_stored_at"]) >= SPTS_RESPONSE_CACHE_SQL_TTL_SECONDS:
+            del _cache[cache_key]
+            entry = None
+        if entry is None:
+            _cache_stats["misses"] += 1
+            return None
+
+        _cache.move_to_end(cache_key)
+        _cache_stats["hits"] += 1
+        results_fresh = _age(entry["results_stored_at"]) < SPTS_RESPONSE_CACHE_RESULT_TTL_SECONDS
+        return copy.deepcopy(entry["response"]), results_fresh
+
+
+def store_response(cache_key: str, response: dict):
+    if not SPTS_RESPONSE_CACHE_ENABLED:
+        return
+
+    now = time.time()
+    entry = {
+        "response": copy.deepcopy(response),
+        "sql_stored_at": now,
+        "results_stored_at": now,
+    }
+    with _cache_lock:
+        _cache[cache_key] = entry
+        _cache.move_to_end(cache_key)
+        while len(_cache) > max(1, SPTS_RESPONSE_CACHE_SIZE):
+            _cache.popitem(last=False)
+
+
+def update_cached_results(cache_key: str, results: dict):
+    """Replace the execution results of a cached entry after a re-execution."""
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is None:
+            return
+        for field in RESULT_FIELDS:
+            if field in results:
+                entry["response"][field] = copy.deepcopy(results[field])
+        entry["results_stored_at"] = time.time()
+        _cache_stats["result_refreshes"] += 1
+
+
+def drop_cached_response(cache_key: str):
+    with _cache_lock:
+        _cache.pop(cache_key, None)
+
+
+def invalidate_response_cache():
+    with _cache_lock:
+        _cache.clear()
+        _cache_stats["invalidations"] += 1
+
+
+def get_response_cache_stats() -> dict:
+    with _cache_lock:
+        return {
+            "enabled": SPTS_RESPONSE_CACHE_ENABLED,
+            "size": len(_cache),
+            **_cache_stats,
+        }
@@ -0,0 +1,189 @@
+"""
+semantic_sql_cache.py
+---------------------
+Reuse validated SQL for paraphrased questions.
+
+After a generated query executes successfully, the (question embedding,
+grounded mappings, SQL) tuple is remembered per generation mode and schema
+version. A later question whose embedding is within
+SPTS_SEMANTIC_SQL_CACHE_THRESHOLD cosine similarity, with identical grounded
+mappings, the same numeric literals and the same intent (aggregate, ordering
+and grouping cues plus yes/no form), reuses that SQL once it passes the
+sanitizer and a LIMIT 0 probe, so no Groq call is made.
+
+Only grounded (SPTS) generations take part: without mappings, embeddings alone
+cannot tell "schools in Alameda County" from "schools in Fresno County".
+"""
+
+import json
+import re
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+try:
+    from .config import (
+        SPTS_SEMANTIC_SQL_CACHE_ENABLED,
+        SPTS_SEMANTIC_SQL_CACHE_SIZE,
+        SPTS_SEMANTIC_SQL_CACHE_THRESHOLD,
+    )
+    from .db_client import probe_sql_executes
+    from .embedding_util import get_embedding
+    from .entity_cache import normalize_query
+except ImportError:
+    from config import (
+        SPTS_SEMANTIC_SQL_CACHE_ENABLED,
+        SPTS_SEMANTIC_SQL_CACHE_SIZE,
+        SPTS_SEMANTIC_SQL_CACHE_THRESHOLD,
+    )
+    from db_client import probe_sql_executes
+    from embedding_util import get_embedding
+    from entity_cache import normalize_query
+
+# Question cues that change the shape of the SQL (aggregate, ordering, grouping).
+# "How many schools are in X?" and "List the schools in X" embed closely but
+# need COUNT(*) versus a row list, so they must never share a bucket.
+_INTENT_CUES = (
+    ("count", r"\bhow many\b|\bnumber of\b|\bcount\b"),
+    ("avg", r"\baverage\b|\bmean\b|\bavg\b"),
+    ("sum", r"\btotal\b|\bsum\b|\bcombined\b|\bhow much\b"),
+    ("max", r"\bhighest\b|\bmaximum\b|\bmax\b|\bmost\b|\blargest\b|\bbiggest\b|\btop\b|\bbest\b"),
+    ("min", r"\blowest\b|\bminimum\b|\bmin\b|\bleast\b|\bsmallest\b|\bfewest\b|\bbottom\b|\bworst\b"),
+    ("ratio", r"\bratio\b|\bpercent(?:age)?\b|\brate\b|%|\bproportion\b"),
+    ("distinct", r"\bdistinct\b|\bunique\b|\bdifferent\b"),
+    ("group", r"\beach\b|\bper\b|\bevery\b|\bgroup(?:ed)? by\b|\bbreakdown\b"),
+    ("order", r"\bsort(?:ed)?\b|\border(?:ed)?\b|\brank(?:ed|ing)?\b|\bascending\b|\bdescending\b"),
+)
+# Leading words of yes/no questions, answered by existence checks rather than row lists.
+_YES_NO_LEADS = {"is", "are", "was", "were", "does", "do", "did", "has", "have", "can"}
+
+_cache_lock = Lock()
+# (mode, schema_version, mapping signature, numbers signature, intent signature, normalized question)
+#   -> (unit-length question embedding, question, sql)
+_cache: OrderedDict[tuple, tuple] = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0, "rejected": 0}
+
+
+def _mapping_signature(mappings) -> str:
+    """Order-insensitive identity of the grounded values a question resolved to."""
+    grounded = sorted(
+        {
+            (
+                str(mapping.get("grounded", "")).strip().lower(),
+                str(mapping.get("table", "")).strip().lower(),
+                str(mapping.get("column", "")).strip().lower(),
+            )
+            for mapping in (mappings or [])
+        }
+    )
+    return json.dumps(grounded)
+
+
+def _numbers_signature(question: str) -> str:
+    # "top 5 schools" and "top 10 schools" embed almost identically but need different SQL.
+    return ",".join(sorted(re.findall(r"\d+(?:\.\d+)?", str(question or ""))))
+
+
+def _intent_signature(question: str) -> str:
+    text = str(question or "").strip().lower()
+    cues = [name for name, pattern in _INTENT_CUES if re.search(pattern, text)]
+    words = re.findall(r"[a-z]+", text)
+    form = "yes_no" if words and words[0] in _YES_NO_LEADS else "open"
+    return f"{form}:{','.join(cues)}"
+
+
+def _unit_vector(question: str):
+    vector = np.asarray(get_embedding(question), dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0:
+        return None
+    return vector / norm
+
+
+def _bucket(mode: str, schema_version: str, mappings, question: str) -> tuple:
+    return (
+        (mode or "").strip().lower(),
+        schema_version,
+        _mapping_signature(mappings),
+        _numbers_signature(question),
+        _intent_signature(question),
+    )
+
+
+def lookup_sql(question: str, mode: str, mappings, schema_version: str):
+    """
+    Return {"sql", "similarity", "matched_question"} for a reusable paraphrase, or None.
+    The candidate must still pass the sanitizer and a LIMIT 0 execution probe.
+    """
+    if not SPTS_SEMANTIC_SQL_CACHE_ENABLED or not mappings:
+        return None
+
+    bucket = _bucket(mode, schema_version, mappings, question)
+    with _cache_lock:
+        candidates = [(key, entry) for key, entry in _cache.items() if key[:-1] == bucket]
+    if not candidates:
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+        return None
+
+    query_vector = _unit_vector(question)
+    if query_vector is None:
+        return None
+
+    best_key, best_entry, best_similarity = None, None, -1.0
+    for key, entry in candidates:
+        vector = entry[0]
+        if vector.shape != query_vector.shape:
+            continue
+        similarity = float(np.dot(query_vector, vector))
+        if similarity > best_similarity:
+            best_key, best_entry, best_similarity = key, entry, similarity
+
+    if best_entry is None or best_similarity < SPTS_SEMANTIC_SQL_CACHE_THRESHOLD:
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+        return None
+
+    _, matched_question, sql = best_entry
+    if not probe_sql_executes(sql):
+        with _cache_lock:
+            _cache.pop(best_key, None)
+            _cache_stats["rejected"] += 1
+        return None
+
+    with _cache_lock:
+        if best_key in _cache:
+            _cache.move_to_end(best_key)
+        _cache_stats["hits"] += 1
+    return {
+        "sql": sql,
+        "similarity": round(best_similarity, 4),
+        "matched_question": matched_question,
+    }
+
+
+def remember_sql(question: str, mode: str, mappings, schema_version: str, sql: str):
+    """Record SQL that was sanitized and executed successfully for this question."""
+    if not SPTS_SEMANTIC_SQL_CACHE_ENABLED or not mappings or not sql or not schema_version:
+        return
+
+    vector = _unit_vector(question)
+    if vector is None:
+        return
+
+    key = _bucket(mode, schema_version, mappings, question) + (normalize_query(question),)
+    with _cache_lock:
+        _cache[key] = (vector, question, sql)
+        _cache.move_to_end(key)
+        while len(_cache) > max(1, SPTS_SEMANTIC_SQL_CACHE_SIZE):
+            _cache.popitem(last=False)
+
+
+def get_semantic_sql_cache_stats() -> dict:
+    with _cache_lock:
+        return {
+            "enabled": SPTS_SEMANTIC_SQL_CACHE_ENABLED,
+            "size": len(_cache),
+            **_cache_stats,
+        }
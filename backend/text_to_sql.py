@@ -1,125 +1,46 @@
+import hashlib
 import os
 import re
 import time
 from threading import Lock
-from groq import Groq, RateLimitError, APITimeoutError
+
+from groq import APITimeoutError, RateLimitError
 
 try:
     from .config import (
-        API_KEY,
-        GROQ_API_KEYS,
         SPTS_SQL_REFLECTION_ENABLED,
         SPTS_SQL_REFLECTION_SCOPE,
     )
+    from .llm_gateway import chat_completion, configured_api_keys
+    from .semantic_sql_cache import lookup_sql
     from .db_client import (
         get_main_dialect_name,
+        get_schema_generation,
         get_table_columns,
         get_table_foreign_keys,
         list_user_tables,
     )
 except ImportError:
     from config import (
-        API_KEY,
-        GROQ_API_KEYS,
         SPTS_SQL_REFLECTION_ENABLED,
         SPTS_SQL_REFLECTION_SCOPE,
     )
+    from llm_gateway import chat_completion, configured_api_keys
+    from semantic_sql_cache import lookup_sql
     from db_client import (
         get_main_dialect_name,
+        get_schema_generation,
         get_table_columns,
         get_table_foreign_keys,
         list_user_tables,
     )
 
-_groq_clients = []
-_groq_rotation_index = 0
-_groq_client_lock = Lock()
+_schema_context_lock = Lock()
+_schema_context_cache = {"generation": None, "summary": "", "version": ""}
 PRIMARY_SQL_MODEL = "llama-3.3-70b-versatile"
 BASELINE_SQL_MODEL = os.getenv("SPTS_BASELINE_SQL_MODEL", PRIMARY_SQL_MODEL).strip() or PRIMARY_SQL_MODEL
 
 
-def _configured_api_keys():
-    keys = [key.strip() for key in (GROQ_API_KEYS or []) if key and key.strip()]
-    if keys:
-        return keys
-    if API_KEY and API_KEY.strip():
-        return [API_KEY.strip()]
-    return []
-
-
-def _ensure_groq_clients():
-    global _groq_clients
-    if _groq_clients:
-        return _groq_clients
-
-    for key in _configured_api_keys():
-        try:
-            _groq_clients.append(Groq(api_key=key))
-        except Exception:
-            continue
-
-    return _groq_clients
-
-
-def _acquire_next_client():
-    global _groq_rotation_index
-    with _groq_client_lock:
-        clients = _ensure_groq_clients()
-        if not clients:
-            return None, -1
-
-        current_index = _groq_rotation_index % len(clients)
-        _groq_rotation_index = (_groq_rotation_index + 1) % len(clients)
-        return clients[current_index], current_index
-
-
-def _is_retryable_groq_error(error: Exception) -> bool:
-    if isinstance(error, (RateLimitError, APITimeoutError)):
-        return True
-
-    error_text = str(error).lower()
-    retryable_markers = (
-        "rate limit",
-        "too many requests",
-        "429",
-        "quota",
-        "timeout",
-        "timed out",
-        "overloaded",
-    )
-    return any(marker in error_text for marker in retryable_markers)
-
-
-def _groq_completion_with_failover(create_completion, attempts_per_key=2):
-    clients = _ensure_groq_clients()
-    if not clients:
-        raise RuntimeError("Missing API_KEY/GROQ_API_KEY/GROQ_API_KEYS")
-
-    total_attempts = max(1, len(clients) * max(1, attempts_per_key))
-    last_error = None
-
-    for attempt in range(total_attempts):
-        client, key_index = _acquire_next_client()
-        if client is None:
-            break
-
-        try:
-            completion = create_completion(client)
-            return completion, key_index
-        except Exception as error:
-            last_error = error
-            if not _is_retryable_groq_error(error):
-                break
-
-            # Short backoff avoids hammering the same exhausted window.
-            time.sleep(min(0.3 * (attempt + 1), 1.5))
-
-    if last_error is not None:
-        raise last_error
-
-    raise RuntimeError("No available Groq clients")
-
-
 def _empty_token_usage():
     return {
         "prompt_tokens": 0,
@@ -206,15 +127,13 @@ def _align_sql_with_mappings(user_query, draft_sql, schema_context, sql_dialect,
 
     try:
         start_time = time.time()
-        completion, key_index = _groq_completion_with_failover(
-            lambda client: client.chat.completions.create(
-                model=PRIMARY_SQL_MODEL,
-                messages=[
-                    {"role": "system", "content": alignment_system_prompt},
-                    {"role": "user", "content": alignment_prompt},
-                ],
-                temperature=0,
-            )
+        completion, key_index = chat_completion(
+            model=PRIMARY_SQL_MODEL,
+            messages=[
+                {"role": "system", "content": alignment_system_prompt},
+                {"role": "user", "content": alignment_prompt},
+            ],
+            temperature=0,
         )
         latency = (time.time() - start_time) * 1000
         aligned = _strip_sql_fences(completion.choices[0].message.content)
@@ -418,15 +337,13 @@ def _reflect_sql_with_llm(
 
     try:
         start_time = time.time()
-        completion, key_index = _groq_completion_with_failover(
-            lambda client: client.chat.completions.create(
-                model=PRIMARY_SQL_MODEL,
-                messages=[
-                    {"role": "system", "content": critic_system_prompt},
-                    {"role": "user", "content": reflection_prompt},
-                ],
-                temperature=0,
-            )
+        completion, key_index = chat_completion(
+            model=PRIMARY_SQL_MODEL,
+            messages=[
+                {"role": "system", "content": critic_system_prompt},
+                {"role": "user", "content": reflection_prompt},
+            ],
+            temperature=0,
         )
         latency = (time.time() - start_time) * 1000
 
@@ -458,31 +375,57 @@ def _reflect_sql_with_llm(
         }
 
 
-def get_schema_summary():
+def _build_schema_summary():
     schema_str = ""
+    tables = list_user_tables()
+
+    for table in tables:
+        columns = get_table_columns(table)
+        col_desc = ", ".join([f"{c['name']} ({c['type']})" for c in columns])
+        schema_str += f"Table: {table}\nColumns: {col_desc}\n"
+
+        fks = get_table_foreign_keys(table)
+        if fks:
+            schema_str += "Foreign Keys:\n"
+            for fk in fks:
+                target_table = fk.get("referred_table", "unknown_table")
+                source_cols = fk.get("constrained_columns", [])
+                target_cols = fk.get("referred_columns", [])
+                for source_col, target_col in zip(source_cols, target_cols):
+                    schema_str += f"  - {table}.{source_col} references {target_table}.{target_col}\n"
+
+        schema_str += "\n"
+
+    return schema_str
+
+
+def get_schema_context():
+    """Return (schema_summary, schema_version), rebuilding only after a schema cache invalidation.
+
+    The version is a short fingerprint of the summary text, so prompts stay
+    byte-identical across requests until the database schema actually changes.
+    """
+    generation = get_schema_generation()
+    with _schema_context_lock:
+        if _schema_context_cache["generation"] == generation:
+            return _schema_context_cache["summary"], _schema_context_cache["version"]
+
     try:
-        tables = list_user_tables()
-
-        for table in tables:
-            columns = get_table_columns(table)
-            col_desc = ", ".join([f"{c['name']} ({c['type']})" for c in columns])
-            schema_str += f"Table: {table}\nColumns: {col_desc}\n"
-
-            fks = get_table_foreign_keys(table)
-            if fks:
-                schema_str += "Foreign Keys:\n"
-                for fk in fks:
-                    target_table = fk.get("referred_table", "unknown_table")
-                    source_cols = fk.get("constrained_columns", [])
-                    target_cols = fk.get("referred_columns", [])
-                    for source_col, target_col in zip(source_cols, target_cols):
-                        schema_str += f"  - {table}.{source_col} references {target_table}.{target_col}\n"
-
-            schema_str += "\n"
+        summary = _build_schema_summary()
     except Exception as e:
-        schema_str = f"Error reading schema: {str(e)}"
+        # Errors are not cached so the next request retries the catalog read.
+        return f"Error reading schema: {str(e)}", ""
 
-    return schema_str
+    version = hashlib.sha256(summary.encode("utf-8")).hexdigest()[:12]
+    with _schema_context_lock:
+        _schema_context_cache["generation"] = generation
+        _schema_context_cache["summary"] = summary
+        _schema_context_cache["version"] = version
+    return summary, version
+
+
+def get_schema_summary():
+    return get_schema_context()[0]
 
 
 def _build_generation_prompt(user_query, schema_context, mode, mappings):
@@ -548,7 +491,7 @@ def _build_generation_prompt(user_query, schema_context, mode, mappings):
 
 
 def generate_sql_with_llm(user_query, mode="Baseline", mappings=None):
-    if not _configured_api_keys():
+    if not configured_api_keys():
         return {
             "sql": "SELECT * FROM error -- API Error: Missing API_KEY/GROQ_API_KEY/GROQ_API_KEYS",
             "rationale": {
@@ -560,7 +503,7 @@ def generate_sql_with_llm(user_query, mode="Baseline", mappings=None):
             },
         }
 
-    schema_context = get_schema_summary()
+    schema_context, schema_version = get_schema_context()
     sql_dialect = get_main_dialect_name()
 
     base_rules = """
@@ -599,17 +542,44 @@ def generate_sql_with_llm(user_query, mode="Baseline", mappings=None):
     mode_name = (mode or "").strip().lower()
     active_model = PRIMARY_SQL_MODEL if mode_name == "spts" else BASELINE_SQL_MODEL
 
+    # Paraphrase of a grounded question whose SQL already executed: reuse it without calling Groq.
+    lookup_start = time.time()
+    reused = None
+    if mode_name == "spts" and mappings:
+        try:
+            reused = lookup_sql(user_query, mode_name, mappings, schema_version)
+        except Exception as e:
+            print(f"[semantic_sql_cache] Warning: lookup failed: {e}")
+    if reused is not None:
+        reflection = _reflection_disabled()
+        reflection["skip_reason"] = "semantic_cache_hit"
+        return {
+            "sql": reused["sql"],
+            "rationale": {
+                "system_prompt": system_prompt.strip(),
+                "injected_context": injected_context_str.strip(),
+                "latency_ms": round((time.time() - lookup_start) * 1000, 2),
+                "token_usage": _empty_token_usage(),
+                "model": active_model,
+                "schema_version": schema_version,
+                "semantic_cache": {
+                    "hit": True,
+                    "similarity": reused["similarity"],
+                    "matched_question": reused["matched_question"],
+                },
+                "reflection": reflection,
+            },
+        }
+
     try:
         start_time = time.time()
-        completion, key_index = _groq_completion_with_failover(
-            lambda client: client.chat.completions.create(
-                model=active_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0,
-            )
+        completion, key_index = chat_completion(
+            model=active_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0,
         )
         latency = (time.time() - start_time) * 1000  # in ms
 
@@ -666,6 +636,7 @@ def generate_sql_with_llm(user_query, mode="Baseline", mappings=None):
                 "token_usage": tokens,
                 "key_index": key_index + 1,
                 "model": active_model,
+                "schema_version": schema_version,
                 "reflection_scope": SPTS_SQL_REFLECTION_SCOPE,
                 "mapping_alignment": mapping_alignment,
                 "reflection": reflection,
@@ -754,7 +725,7 @@ def generate_spts_sql_candidates(user_query, mappings=None, max_candidates: int
 
 
 def fix_sql_with_llm(user_query, bad_sql, error_message, mappings=None):
-    if not _configured_api_keys():
+    if not configured_api_keys():
         return "SELECT * FROM error -- API Error: Missing API_KEY/GROQ_API_KEY/GROQ_API_KEYS"
 
     schema_context = get_schema_summary()
@@ -783,15 +754,13 @@ def fix_sql_with_llm(user_query, bad_sql, error_message, mappings=None):
             user_prompt += f"\n{hint}"
 
     try:
-        completion, _ = _groq_completion_with_failover(
-            lambda client: client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0,
-            )
+        completion, _ = chat_completion(
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0,
         )
         return (
             completion.choices[0]
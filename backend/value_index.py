@@ -0,0 +1,258 @@
+"""
+value_index.py
+--------------
+In-memory inverted index of normalized column values -> (table, column).
+
+Exact schema matching in grounding used to run one COUNT scan per textual
+column per entity. The index is built once from the profiled textual columns
+(at startup and after each VLKG delta job; incremental refreshes re-profile
+only the tables that changed) so an entity resolves to its candidate columns
+with a single lookup_value probe.
+
+Columns with up to SPTS_VALUE_INDEX_MAX_DISTINCT values keep their values in a
+dictionary. Larger columns are streamed once into a sorted array of 64-bit
+value hashes (about 12 bytes per value) that is searched with one binary
+search, so no column needs a live database scan per query.
+"""
+
+import hashlib
+import time
+from threading import Lock
+
+import numpy as np
+
+try:
+    from .config import SPTS_VALUE_INDEX_ENABLED, SPTS_VALUE_INDEX_MAX_DISTINCT
+    from .db_client import (
+        fetch_distinct_non_null_values,
+        get_table_columns,
+        is_textual_column_type,
+        iter_distinct_non_null_values,
+        list_user_tables,
+        value_exists_in_column,
+    )
+except ImportError:
+    from config import SPTS_VALUE_INDEX_ENABLED, SPTS_VALUE_INDEX_MAX_DISTINCT
+    from db_client import (
+        fetch_distinct_non_null_values,
+        get_table_columns,
+        is_textual_column_type,
+        iter_distinct_non_null_values,
+        list_user_tables,
+        value_exists_in_column,
+    )
+
+_index_lock = Lock()
+_value_index: dict[str, set[tuple[str, str]]] = {}
+_indexed_columns: set[tuple[str, str]] = set()
+# Hashed tier for high-cardinality columns: sorted value hashes with a parallel
+# array of location ids into _hashed_locations.
+_hashed_keys = np.empty(0, dtype=np.uint64)
+_hashed_location_ids = np.empty(0, dtype=np.int32)
+_hashed_locations: list[tuple[str, str]] = []
+_hashed_columns: set[tuple[str, str]] = set()
+_index_ready = False
+_last_build = {
+    "built_at": None,
+    "build_ms": 0,
+    "skipped_columns": 0,
+    "error": None,
+}
+
+
+def normalize_value(value) -> str:
+    """Mirror the lower(trim(cast(...))) normalization used by value_exists_in_column."""
+    if value is None:
+        return ""
+    return str(value).strip().lower()
+
+
+def _hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _index_without_tables(tables: set[str]):
+    """Copy of the current index with every location from the given tables removed."""
+    with _index_lock:
+        if not _index_ready:
+            return None
+        index = {}
+        for key, locations in _value_index.items():
+            kept = {location for location in locations if location[0] not in tables}
+            if kept:
+                index[key] = kept
+        columns = {location for location in _indexed_columns if location[0] not in tables}
+
+        dropped_ids = [i for i, location in enumerate(_hashed_locations) if location[0] in tables]
+        keep = ~np.isin(_hashed_location_ids, dropped_ids)
+        hashed = (
+            _hashed_keys[keep],
+            _hashed_location_ids[keep],
+            list(_hashed_locations),
+            {location for location in _hashed_columns if location[0] not in tables},
+        )
+    return index, columns, hashed
+
+
+def _hash_column(table: str, column_name: str) -> np.ndarray:
+    """Stream every distinct value of a large column into a deduplicated hash array."""
+    hashes = []
+    for chunk in iter_distinct_non_null_values(table, column_name, SPTS_VALUE_INDEX_MAX_DISTINCT):
+        for value in chunk:
+            key = normalize_value(value)
+            if key:
+                hashes.append(_hash_key(key))
+    return np.unique(np.asarray(hashes, dtype=np.uint64))
+
+
+def build_value_index(tables=None) -> bool:
+    """
+    Profile textual columns and atomically swap in a fresh index.
+    When tables is given and an index already exists, only those tables are re-profiled.
+    """
+    global _value_index, _indexed_columns, _index_ready
+    global _hashed_keys, _hashed_location_ids, _hashed_locations, _hashed_columns
+
+    if not SPTS_VALUE_INDEX_ENABLED:
+        return False
+
+    start_time = time.time()
+    new_index: dict[str, set[tuple[str, str]]] = {}
+    new_columns: set[tuple[str, str]] = set()
+    key_parts = []
+    id_parts = []
+    hashed_locations: list[tuple[str, str]] = []
+    hashed_columns: set[tuple[str, str]] = set()
+    skipped_columns = 0
+
+    target_tables = None
+    if tables is not None:
+        existing = _index_without_tables(set(tables))
+        if existing is not None:
+            new_index, new_columns, hashed = existing
+            kept_keys, kept_ids, hashed_locations, hashed_columns = hashed
+            key_parts.append(kept_keys)
+            id_parts.append(kept_ids)
+            target_tables = set(tables)
+    location_ids = {location: i for i, location in enumerate(hashed_locations)}
+
+    try:
+        for table in list_user_tables():
+            if target_tables is not None and table not in target_tables:
+                continue
+            for column in get_table_columns(table):
+                column_name = str(column.get("name", "") or "")
+                column_type = column.get("type")
+                if not column_name:
+                    continue
+                if column_type is not None and not is_textual_column_type(column_type):
+                    continue
+
+                location = (table, column_name)
+                try:
+                    # Fetch one extra row so oversized columns are detected without a COUNT.
+                    values = fetch_distinct_non_null_values(
+                        table, column_name, SPTS_VALUE_INDEX_MAX_DISTINCT + 1
+                    )
+                    if len(values) > SPTS_VALUE_INDEX_MAX_DISTINCT:
+                        column_hashes = _hash_column(table, column_name)
+                        if location not in location_ids:
+                            location_ids[location] = len(hashed_locations)
+                            hashed_locations.append(location)
+                        key_parts.append(column_hashes)
+                        id_parts.append(np.full(len(column_hashes), location_ids[location], dtype=np.int32))
+                        hashed_columns.add(location)
+                        continue
+                except Exception as e:
+                    print(f"[value_index] Warning: could not profile {table}.{column_name}: {e}")
+                    skipped_columns += 1
+                    continue
+
+                for value in values:
+                    key = normalize_value(value)
+                    if key:
+                        new_index.setdefault(key, set()).add(location)
+                new_columns.add(location)
+    except Exception as e:
+        print(f"[value_index] Warning: value index build failed: {e}")
+        with _index_lock:
+            _last_build["error"] = str(e)
+        return False
+
+    hashed_keys = np.concatenate(key_parts) if key_parts else np.empty(0, dtype=np.uint64)
+    hashed_ids = np.concatenate(id_parts) if id_parts else np.empty(0, dtype=np.int32)
+    order = np.argsort(hashed_keys, kind="stable")
+
+    with _index_lock:
+        _value_index = new_index
+        _indexed_columns = new_columns
+        _hashed_keys = hashed_keys[order]
+        _hashed_location_ids = hashed_ids[order]
+        _hashed_locations = hashed_locations
+        _hashed_columns = hashed_columns
+        _index_ready = True
+        _last_build["built_at"] = time.time()
+        _last_build["build_ms"] = round((time.time() - start_time) * 1000, 2)
+        if target_tables is None:
+            _last_build["skipped_columns"] = skipped_columns
+        _last_build["error"] = None
+
+    scope = "" if target_tables is None else f" after refreshing {len(target_tables)} table(s)"
+    print(
+        f"[value_index] Indexed {len(new_index)} distinct values across "
+        f"{len(new_columns)} columns and {len(hashed_keys)} hashed values across "
+        f"{len(hashed_columns)} large columns{scope} ({skipped_columns} skipped)."
+    )
+    return True
+
+
+def is_value_index_ready() -> bool:
+    with _index_lock:
+        return _index_ready
+
+
+def lookup_value(value) -> set[tuple[str, str]]:
+    """Return the indexed (table, column) locations holding the normalized value."""
+    key = normalize_value(value)
+    if not key:
+        return set()
+    hashed = np.uint64(_hash_key(key))
+    with _index_lock:
+        locations = set(_value_index.get(key, ()))
+        start = np.searchsorted(_hashed_keys, hashed, side="left")
+        end = np.searchsorted(_hashed_keys, hashed, side="right")
+        for location_id in _hashed_location_ids[start:end]:
+            locations.add(_hashed_locations[location_id])
+    return locations
+
+
+def is_column_indexed(table_name: str, column_name: str) -> bool:
+    location = (table_name, column_name)
+    with _index_lock:
+        return _index_ready and (location in _indexed_columns or location in _hashed_columns)
+
+
+def value_in_column(table_name: str, column_name: str, value) -> bool:
+    """Exact normalized membership check, served from the index when the column is covered."""
+    if not normalize_value(value):
+        return False
+
+    if is_column_indexed(table_name, column_name):
+        return (table_name, column_name) in lookup_value(value)
+
+    return value_exists_in_column(table_name, column_name, value)
+
+
+def get_value_index_status() -> dict:
+    with _index_lock:
+        return {
+            "enabled": SPTS_VALUE_INDEX_ENABLED,
+            "ready": _index_ready,
+            "indexed_columns": len(_indexed_columns),
+            "distinct_values": len(_value_index),
+            "hashed_columns": len(_hashed_columns),
+            "hashed_values": int(len(_hashed_keys)),
+            "skipped_columns": _last_build["skipped_columns"],
+            "build_ms": _last_build["build_ms"],
+            "error": _last_build["error"],
+        }
@@ -4,9 +4,10 @@ import os
 import re
 import sys
 import time
-from urllib.parse import parse_qsl, urlencode, urlsplit
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
 from metrics_calculator import compare_execution_results, evaluate_etm
 
@@ -65,6 +66,7 @@ def retry_with_backoff(func):
 try:
     from backend.grounding import ground_query
     from backend.config import get_main_database_url
+    from backend.db_client import create_database_engine
     from backend.text_to_sql import (
         baseline_text_to_sql,
         fix_sql_with_llm,
@@ -89,6 +91,8 @@ DEFAULT_LOG = "evaluation_log.json"
 DEFAULT_METRICS = "final_thesis_metrics.json"
 DEFAULT_EVAL_DB_PATH = os.getenv("SPTS_EVAL_DB_PATH", "").strip()
 DEFAULT_EVAL_DB_URL = os.getenv("SPTS_EVAL_DATABASE_URL", "").strip()
+# Engines kept open at once; multi-database (BIRD) runs evict the least recently used.
+MAX_TARGET_ENGINES = int(os.getenv("SPTS_EVAL_MAX_ENGINES") or "16")
 
 
 def ensure_default_dataset_exists(test_data_path: str) -> bool:
@@ -174,12 +178,67 @@ def _resolve_row_database_target(item: dict, explicit_db_path: str, explicit_db_
         )
 
 
+# Registry of evaluation engines keyed by database target, reused across gold SQL,
+# candidates and retries for the whole run and disposed at its end.
+_target_engines: OrderedDict[tuple, object] = OrderedDict()
+_target_engine_stats = {"created": 0, "reused": 0, "evicted": 0}
+
+
+def _target_engine_key(database_url: str) -> tuple:
+    """
+    Identity of the database behind a URL. Row-level db_path and db_url values that
+    name the same SQLite file (relative or absolute, with or without file:) share a key.
+    """
+    if not database_url.lower().startswith("sqlite://"):
+        return ("url", database_url)
+
+    parsed = urlsplit(database_url)
+    target = f"{parsed.netloc}{parsed.path}" if parsed.netloc else parsed.path[1:]
+    if target.lower().startswith("file:"):
+        target = target[5:]
+    target = unquote(target)
+    if not target or target == ":memory:":
+        return ("url", database_url)
+
+    options = tuple(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return ("sqlite", os.path.realpath(target), options)
+
+
+def _engine_for_target(database_url: str):
+    key = _target_engine_key(database_url)
+    engine = _target_engines.get(key)
+    if engine is not None:
+        _target_engines.move_to_end(key)
+        _target_engine_stats["reused"] += 1
+        return engine
+
+    engine = create_database_engine(database_url)
+    _target_engines[key] = engine
+    _target_engine_stats["created"] += 1
+    while len(_target_engines) > max(1, MAX_TARGET_ENGINES):
+        _, evicted = _target_engines.popitem(last=False)
+        evicted.dispose()
+        _target_engine_stats["evicted"] += 1
+    return engine
+
+
+def dispose_target_engines() -> dict:
+    """Close every pooled evaluation connection; returns the run's engine statistics."""
+    while _target_engines:
+        _, engine = _target_engines.popitem(last=False)
+        engine.dispose()
+    stats = dict(_target_engine_stats)
+    for name in _target_engine_stats:
+        _target_engine_stats[name] = 0
+    return stats
+
+
 def _execute_sql_on_target(sql: str, database_url: str) -> dict:
     if not sql or not sql.strip():
         return {"success": False, "error": "Empty SQL query", "data": []}
 
     try:
-        engine = create_engine(database_url, pool_pre_ping=True)
+        engine = _engine_for_target(database_url)
         with engine.connect() as conn:
             result = conn.execute(text(sql))
             if not result.returns_rows:
@@ -549,6 +608,25 @@ def run_evaluation(
     db_path: str = DEFAULT_EVAL_DB_PATH,
     db_url: str = DEFAULT_EVAL_DB_URL,
     delay_seconds: float = API_DELAY_SECONDS,
+):
+    try:
+        _run_evaluation(test_data_path, output_log_path, final_metrics_path, db_path, db_url, delay_seconds)
+    finally:
+        stats = dispose_target_engines()
+        if stats["created"]:
+            print(
+                f"Database engines: {stats['created']} created, {stats['reused']} reuses, "
+                f"{stats['evicted']} evicted (all disposed)."
+            )
+
+
+def _run_evaluation(
+    test_data_path: str,
+    output_log_path: str,
+    final_metrics_path: str,
+    db_path: str,
+    db_url: str,
+    delay_seconds: float,
 ):
     if not test_data_path:
         print(
@@ -220,12 +220,22 @@ function _renderQueryUnavailable(detail) {
   showRationaleEmpty();
 }
 
+function _renderGrounding(mappings) {
+  const groundingBox = document.getElementById("grounding-container");
+  if (mappings && mappings.length > 0) {
+    groundingBox.style.display = "block";
+    renderKnowledgeGraph(mappings);
+  } else {
+    groundingBox.style.display = "none";
+  }
+}
+
 function _renderQuerySuccess(data) {
   document.getElementById("base-sql").textContent = data.baseline_sql;
-  renderResult("base-result", data.baseline_result);
+  renderResult("base-result", data.baseline_result, data.baseline_result_page);
 
   document.getElementById("spts-sql").textContent = data.spts_sql;
-  renderResult("spts-result", data.spts_result);
+  renderResult("spts-result", data.spts_result, data.spts_result_page);
 
   currentQueryIndex = (data.query_index !== null && data.query_index !== undefined) ? data.query_index : null;
   if (currentQueryIndex !== null) {
@@ -233,13 +243,7 @@ function _renderQuerySuccess(data) {
     document.getElementById("spts-feedback").style.display = "flex";
   }
 
-  const groundingBox = document.getElementById("grounding-container");
-  if (data.mappings && data.mappings.length > 0) {
-    groundingBox.style.display = "block";
-    renderKnowledgeGraph(data.mappings);
-  } else {
-    groundingBox.style.display = "none";
-  }
+  _renderGrounding(data.mappings);
 
   if (data.spts_rationale) {
     populateRationale(data.spts_rationale);
@@ -248,6 +252,69 @@ function _renderQuerySuccess(data) {
   }
 }
 
+// Partial results from /query/stream; `complete` carries the full /query body.
+function _renderQueryEvent(event, data) {
+  // Show each stage as soon as it lands instead of keeping the whole area dimmed.
+  document.getElementById("resultsArea").style.opacity = "1";
+
+  switch (event) {
+    case "grounding":
+      _renderGrounding(data.mappings);
+      break;
+    case "baseline_sql":
+      document.getElementById("base-sql").textContent = data.sql;
+      break;
+    case "baseline_result":
+      renderResult("base-result", data.result, data.page);
+      break;
+    case "spts_sql":
+      document.getElementById("spts-sql").textContent = data.sql;
+      break;
+    case "spts_result":
+      renderResult("spts-result", data.result, data.page);
+      break;
+    case "complete":
+      _renderQuerySuccess(data);
+      break;
+    case "error":
+      _renderQueryUnavailable(data.detail || `Request failed with status ${data.status_code}`);
+      break;
+    default:
+      break;
+  }
+}
+
+function _parseSseBlock(block) {
+  let event = "message";
+  const dataLines = [];
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+  }
+  if (dataLines.length === 0) return null;
+  return { event, data: JSON.parse(dataLines.join("\n")) };
+}
+
+async function _readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true }).replaceAll("\r\n", "\n");
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const parsed = _parseSseBlock(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      if (parsed) onEvent(parsed.event, parsed.data);
+      boundary = buffer.indexOf("\n\n");
+    }
+  }
+}
+
 async function runQuery() {
   const queryInput = document.getElementById("query");
   if (!queryInput?.value?.trim()) {
@@ -263,7 +330,8 @@ async function runQuery() {
       return;
     }
 
-    const response = await fetch("/query", {
+    const streaming = typeof ReadableStream !== "undefined" && typeof TextDecoder !== "undefined";
+    const response = await fetch(streaming ? "/query/stream" : "/query", {
       method: "POST",
       headers: { 
         "Content-Type": "application/json",
@@ -288,8 +356,12 @@ async function runQuery() {
       return;
     }
 
-    const data = await response.json();
-    _renderQuerySuccess(data);
+    if (streaming && response.body) {
+      await _readEventStream(response, _renderQueryEvent);
+    } else {
+      const data = await response.json();
+      _renderQuerySuccess(data);
+    }
 
   } catch (err) {
     alert("Error: " + err);
@@ -300,7 +372,7 @@ async function runQuery() {
   }
 }
 
-function renderResult(elementId, resultData) {
+function renderResult(elementId, resultData, page) {
   const el = document.getElementById(elementId);
 
   if (!resultData) {
@@ -353,6 +425,8 @@ function renderResult(elementId, resultData) {
 
   if (count === 1 && !Number.isNaN(Number(sample))) {
     el.textContent = `Success: Count is ${sample}`;
+  } else if (page?.truncated) {
+    el.textContent = `Success: first ${count} Row(s) shown (more available)\nSample: "${sample}"...`;
   } else {
     el.textContent = `Success: ${count} Row(s) Found\nSample: "${sample}"...`;
   }
@@ -1,42 +1,132 @@
+import json
 import os
+import random
 import sys
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 import chromadb
-from groq import Groq
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 try:
     # Package import path (used when loaded via backend modules)
     from backend.embedding_util import get_embeddings_batch
-    from backend.config import CHROMA_PATH, API_KEY
+    from backend.config import (
+        CHROMA_PATH,
+        SPTS_SYNONYM_ATTEMPTS_PER_KEY,
+        SPTS_SYNONYM_BATCH_SIZE,
+        SPTS_SYNONYM_MAX_WORKERS,
+        SPTS_SYNONYM_RPM_PER_KEY,
+        SPTS_VLKG_COLUMN_BUDGET,
+        SPTS_VLKG_COLUMN_BUDGETS,
+        SPTS_VLKG_PROFILE_CHUNK_SIZE,
+        SPTS_VLKG_PROFILE_MODE,
+        SPTS_VLKG_PROGRESS_EVERY,
+        SPTS_VLKG_SYNONYM_VALUE_LIMIT,
+    )
     from backend.db_client import (
         count_distinct_non_null,
         fetch_distinct_non_null_values,
+        fetch_top_distinct_values,
         get_table_columns,
         is_textual_column_type,
+        iter_distinct_non_null_values,
         list_user_tables,
     )
+    from backend.llm_gateway import chat_completion, configured_api_keys
+    from kg.synonym_store import get_cached_synonyms, store_synonyms
+    from kg.vlkg_manifest import (
+        activate_build,
+        clear_synonym_retries,
+        get_synonym_retries,
+        record_signatures,
+        record_synonym_retries,
+    )
 except ImportError:
     # Standalone script path (python build_vlkg.py)
     sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, "..", "backend")))
     from embedding_util import get_embeddings_batch
-    from config import CHROMA_PATH, API_KEY
+    from config import (
+        CHROMA_PATH,
+        SPTS_SYNONYM_ATTEMPTS_PER_KEY,
+        SPTS_SYNONYM_BATCH_SIZE,
+        SPTS_SYNONYM_MAX_WORKERS,
+        SPTS_SYNONYM_RPM_PER_KEY,
+        SPTS_VLKG_COLUMN_BUDGET,
+        SPTS_VLKG_COLUMN_BUDGETS,
+        SPTS_VLKG_PROFILE_CHUNK_SIZE,
+        SPTS_VLKG_PROFILE_MODE,
+        SPTS_VLKG_PROGRESS_EVERY,
+        SPTS_VLKG_SYNONYM_VALUE_LIMIT,
+    )
     from db_client import (
         count_distinct_non_null,
         fetch_distinct_non_null_values,
+        fetch_top_distinct_values,
         get_table_columns,
         is_textual_column_type,
+        iter_distinct_non_null_values,
         list_user_tables,
     )
+    from llm_gateway import chat_completion, configured_api_keys
+    from synonym_store import get_cached_synonyms, store_synonyms
+    from vlkg_manifest import (
+        activate_build,
+        clear_synonym_retries,
+        get_synonym_retries,
+        record_signatures,
+        record_synonym_retries,
+    )
 
-client = Groq(api_key=API_KEY) if API_KEY else None
-
+# Columns up to this many distinct values are enumerated in full; larger ones
+# are profiled according to SPTS_VLKG_PROFILE_MODE within their column budget.
 MAX_DISTINCT_VALUES = 100
+PROFILE_MODES = ("topk", "sample", "full", "skip")
+COLLECTION_NAME = "spts_vlkg"
+SHADOW_COLLECTION_PREFIX = f"{COLLECTION_NAME}__shadow_"
+RETIRED_COLLECTION_NAME = f"{COLLECTION_NAME}__retired"
+STALE_SHADOW_SECONDS = 24 * 60 * 60
+# Bump when the synonym prompts change so cached synonyms are regenerated.
+SYNONYM_PROMPT_VERSION = "v1"
+# The gateway already fails over across keys; this retries a whole batch once more.
+BATCH_REQUEST_ATTEMPTS = 2
+
+_pacer_lock = Lock()
+_build_lock = Lock()
+_next_request_at = 0.0
+
+
+def _wait_for_request_slot():
+    """Space request starts so the whole key pool stays under its combined per-minute budget."""
+    global _next_request_at
+    budget_per_minute = SPTS_SYNONYM_RPM_PER_KEY * max(1, len(configured_api_keys()))
+    if budget_per_minute <= 0:
+        return
+
+    interval = 60.0 / budget_per_minute
+    with _pacer_lock:
+        slot = max(time.monotonic(), _next_request_at)
+        _next_request_at = slot + interval
+
+    delay = slot - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _synonym_worker_count() -> int:
+    if SPTS_SYNONYM_MAX_WORKERS > 0:
+        return SPTS_SYNONYM_MAX_WORKERS
+    return max(1, 2 * len(configured_api_keys()))
+
 
 def generate_synonyms(value, column_context):
     """
     Context-Aware Synonym Generation.
     """
+    if not configured_api_keys():
+        return []
+
     prompt = f"""
     Context: Database Column '{column_context}'.
     Value: "{value}".
@@ -45,13 +135,14 @@ def generate_synonyms(value, column_context):
     Output ONLY JSON object with key 'synonyms'. Do not add markdown blocks.
     """
     try:
-        resp = client.chat.completions.create(
+        _wait_for_request_slot()
+        resp, _ = chat_completion(
             model="llama-3.3-70b-versatile",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
             response_format={"type": "json_object"},
+            attempts_per_key=SPTS_SYNONYM_ATTEMPTS_PER_KEY,
         )
-        import json
         content = resp.choices[0].message.content
         data = json.loads(content)
         return data.get("synonyms", [])
@@ -59,100 +150,482 @@ def generate_synonyms(value, column_context):
         print(f"      [!] Error generating synonyms for '{value}': {e}")
         return []
 
-def build_graph():
-    print("Initializing ChromaDB Persistent Client...")
-    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-    
-    # 3. Reset the collection for a fresh build
-    collection_name = "spts_vlkg"
+
+def _clean_synonym_list(raw):
+    if not isinstance(raw, list):
+        return None
+    return [str(item) for item in raw if isinstance(item, str) and item.strip()]
+
+
+def generate_synonyms_batch(values, column_context):
+    """
+    Batched Context-Aware Synonym Generation.
+    Sends several values from the same column in one JSON-mode request and
+    falls back to the single-value prompt only for values missing from a
+    reply that parsed. If the batch itself keeps failing (rate limit, timeout,
+    malformed reply) its values are left out of the result, so they are not
+    stored and are queued for retry by the next delta run, instead of turning
+    one throttled request into one request per value.
+    """
+    if len(values) <= 1 or not configured_api_keys():
+        return {value: generate_synonyms(value, column_context) for value in values}
+
+    prompt = f"""
+    Context: Database Column '{column_context}'.
+    Values: {json.dumps(values, ensure_ascii=False)}
+    Task: For EACH value, generate 3 likely user abbreviations, slang, or variations.
+    Example: {{"Los Angeles Unified": ["LAUSD", "LA Unified", "L.A. Schools"]}}
+    Output ONLY JSON object with key 'synonyms' mapping every value, exactly as given, to its list of variations. Do not add markdown blocks.
+    """
+    batch_map = None
+    for attempt in range(1, BATCH_REQUEST_ATTEMPTS + 1):
+        try:
+            _wait_for_request_slot()
+            resp, _ = chat_completion(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                response_format={"type": "json_object"},
+                attempts_per_key=SPTS_SYNONYM_ATTEMPTS_PER_KEY,
+            )
+            data = json.loads(resp.choices[0].message.content)
+            if not isinstance(data.get("synonyms"), dict):
+                raise ValueError("reply has no 'synonyms' object")
+            batch_map = data["synonyms"]
+            break
+        except Exception as e:
+            print(
+                f"      [!] Batched synonym request {attempt}/{BATCH_REQUEST_ATTEMPTS} failed for "
+                f"{len(values)} values in '{column_context}': {e}"
+            )
+
+    if batch_map is None:
+        return {}
+
+    results = {}
+    for value in values:
+        synonyms = _clean_synonym_list(batch_map.get(value))
+        if synonyms is None:
+            synonyms = generate_synonyms(value, column_context)
+        results[value] = synonyms
+    return results
+
+
+def generate_synonyms_for_values(table, column, values, executor):
+    """
+    Resolve synonyms for one column's values: reuse the persistent synonym store,
+    then fan batched requests for the remaining values out over the worker pool.
+    """
+    results = get_cached_synonyms(table, column, values, SYNONYM_PROMPT_VERSION)
+    pending = [value for value in values if value not in results]
+    if results:
+        print(f"      -> Reusing stored synonyms for {len(results)}/{len(values)} values.")
+    if not pending:
+        return results
+
+    batch_size = max(1, SPTS_SYNONYM_BATCH_SIZE)
+    chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    futures = [executor.submit(generate_synonyms_batch, chunk, column) for chunk in chunks]
+
+    generated = {}
+    for future in futures:
+        generated.update(future.result())
+
+    store_synonyms(table, column, generated, SYNONYM_PROMPT_VERSION)
+    results.update(generated)
+    return results
+
+
+def column_budget(table, column) -> int:
+    return SPTS_VLKG_COLUMN_BUDGETS.get(f"{table}.{column}", SPTS_VLKG_COLUMN_BUDGET)
+
+
+def profile_mode() -> str:
+    if SPTS_VLKG_PROFILE_MODE in PROFILE_MODES:
+        return SPTS_VLKG_PROFILE_MODE
+    print(f"      [!] Unknown SPTS_VLKG_PROFILE_MODE '{SPTS_VLKG_PROFILE_MODE}', using 'topk'.")
+    return "topk"
+
+
+def _clean_values(values):
+    return [value for value in values if isinstance(value, str) and value.strip()]
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _reservoir_sample(table, column, budget, chunk_size):
+    """Uniform sample of a column's distinct values in one streaming pass (seeded per column)."""
+    rng = random.Random(f"{table}.{column}")
+    reservoir = []
+    seen = 0
+    for chunk in iter_distinct_non_null_values(table, column, chunk_size):
+        for value in _clean_values(chunk):
+            seen += 1
+            if len(reservoir) < budget:
+                reservoir.append(value)
+            else:
+                slot = rng.randrange(seen)
+                if slot < budget:
+                    reservoir[slot] = value
+    return reservoir
+
+
+def iter_column_value_chunks(table, column, distinct_count=None):
+    """
+    Yield the values to profile for one column, in chunks.
+    Small columns are enumerated as before. High-cardinality columns are
+    profiled by frequency-ranked top-K, reservoir sampling, or chunked full
+    enumeration, capped by the column budget. distinct_count, when the caller
+    already knows it, saves a probe query.
+    """
+    chunk_size = max(1, SPTS_VLKG_PROFILE_CHUNK_SIZE)
+
+    if distinct_count is None:
+        probe = fetch_distinct_non_null_values(table, column, MAX_DISTINCT_VALUES + 1)
+        if len(probe) <= MAX_DISTINCT_VALUES:
+            values = _clean_values(probe)
+            if values:
+                yield values
+            return
+    elif distinct_count <= MAX_DISTINCT_VALUES:
+        values = _clean_values(fetch_distinct_non_null_values(table, column, MAX_DISTINCT_VALUES))
+        if values:
+            yield values
+        return
+
+    mode = profile_mode()
+    budget = column_budget(table, column)
+    if mode == "skip" or (budget <= 0 and mode != "full"):
+        print(f"      -> Skipping high-cardinality column {table}.{column} (mode={mode}, budget={budget})")
+        return
+
+    if mode == "topk":
+        yield from _chunks(_clean_values(fetch_top_distinct_values(table, column, budget)), chunk_size)
+        return
+
+    if mode == "sample":
+        yield from _chunks(_reservoir_sample(table, column, budget, chunk_size), chunk_size)
+        return
+
+    emitted = 0
+    stream = iter_distinct_non_null_values(table, column, chunk_size)
     try:
-        chroma_client.delete_collection(name=collection_name)
-    except Exception:
-        pass # Collection might not exist yet, which is fine
-        
-    collection = chroma_client.create_collection(name=collection_name)
+        for chunk in stream:
+            values = _clean_values(chunk)
+            if budget > 0:
+                values = values[:budget - emitted]
+            if values:
+                yield values
+                emitted += len(values)
+            if budget > 0 and emitted >= budget:
+                break
+    finally:
+        stream.close()
 
-    tables = list_user_tables()
 
-    for table in tables:
-        print(f"\nAnalyzing table: {table}")
-        columns_info = get_table_columns(table)
+def _aliases_for_value(canonical, synonyms):
+    aliases = list(synonyms)
+
+    clean_words = [w for w in canonical.split() if w.isalnum()]
+    if len(clean_words) > 1:
+        initials = "".join(w[0] for w in clean_words).lower()
+        if len(initials) > 1:
+            aliases.append(initials)
+
+    # Include the original canonical value in the search space
+    aliases.append(canonical)
+
+    # Deduplicate any overlap
+    return list(set([a.strip() for a in aliases if a.strip()]))
 
-        text_cols = [c["name"] for c in columns_info if is_textual_column_type(c.get("type"))]
 
-        if not text_cols:
-            print(f"   -> No text columns found in {table}. Skipping.")
+def add_column_values(collection, build_id, table, column, values, executor, synonym_values=None):
+    """
+    Embed one chunk of canonical values (plus aliases) into the collection and
+    record their signatures. synonym_values limits LLM synonym generation to a
+    subset of the chunk (default: every value); values whose synonyms could not
+    be generated are queued in the manifest for retry_synonyms. Returns the
+    number of documents added.
+    """
+    if synonym_values is None:
+        synonym_values = values
+    synonyms_by_value = (
+        generate_synonyms_for_values(table, column, synonym_values, executor) if synonym_values else {}
+    )
+
+    batch_docs = []
+    batch_metadatas = []
+    batch_ids = []
+    for canonical in values:
+        for alias in _aliases_for_value(canonical, synonyms_by_value.get(canonical, [])):
+            batch_docs.append(alias)
+            batch_metadatas.append({
+                "canonical": canonical,
+                "table": table,
+                "column": column
+            })
+            # ChromaDB requires a unique ID for every single document
+            batch_ids.append(str(uuid.uuid4()))
+
+    if batch_docs:
+        batch_embeddings = get_embeddings_batch(batch_docs, use_cache=False)
+        collection.add(
+            documents=batch_docs,
+            embeddings=batch_embeddings,
+            metadatas=batch_metadatas,
+            ids=batch_ids
+        )
+        record_signatures(build_id, table, column, values)
+        record_synonym_retries(
+            build_id, table, column, [value for value in synonym_values if value not in synonyms_by_value]
+        )
+    return len(batch_docs)
+
+
+def retry_synonyms(collection, build_id, table, column, executor):
+    """
+    Generate synonyms for values whose synonym request failed in an earlier run and
+    add only the new aliases (the canonical value is already stored).
+    Returns the number of documents added.
+    """
+    pending = get_synonym_retries(build_id, table, column)
+    if not pending:
+        return 0
+
+    synonyms_by_value = generate_synonyms_for_values(table, column, pending, executor)
+    resolved = [value for value in pending if value in synonyms_by_value]
+
+    batch_docs = []
+    batch_metadatas = []
+    for canonical in resolved:
+        stored = set(_aliases_for_value(canonical, []))
+        for alias in _aliases_for_value(canonical, synonyms_by_value[canonical]):
+            if alias in stored:
+                continue
+            batch_docs.append(alias)
+            batch_metadatas.append({
+                "canonical": canonical,
+                "table": table,
+                "column": column
+            })
+
+    if batch_docs:
+        collection.add(
+            documents=batch_docs,
+            embeddings=get_embeddings_batch(batch_docs, use_cache=False),
+            metadatas=batch_metadatas,
+            ids=[str(uuid.uuid4()) for _ in batch_docs]
+        )
+    clear_synonym_retries(build_id, table, column, resolved)
+    return len(batch_docs)
+
+
+def profile_column(collection, build_id, table, column, executor, distinct_count=None, value_filter=None):
+    """
+    Profile one column chunk by chunk, with progress reporting.
+    value_filter, if given, narrows each chunk (delta runs drop known values).
+    Returns (values_added, documents_added).
+    """
+    synonym_quota = max(0, SPTS_VLKG_SYNONYM_VALUE_LIMIT)
+    values_added = 0
+    documents_added = 0
+    seen = 0
+
+    for chunk in iter_column_value_chunks(table, column, distinct_count):
+        seen += len(chunk)
+        values = value_filter(chunk) if value_filter is not None else chunk
+        if values:
+            synonym_values = values[:max(0, synonym_quota - values_added)]
+            documents_added += add_column_values(
+                collection, build_id, table, column, values, executor, synonym_values
+            )
+            values_added += len(values)
+
+        every = SPTS_VLKG_PROGRESS_EVERY
+        if every > 0 and (seen - len(chunk)) // every != seen // every:
+            print(f"      .. {table}.{column}: {seen} values scanned, {values_added} added")
+
+    return values_added, documents_added
+
+
+def _collection_names(chroma_client) -> list[str]:
+    # Older chromadb releases return Collection objects, newer ones return names.
+    return [getattr(item, "name", item) for item in chroma_client.list_collections()]
+
+
+def _drop_stale_build_collections(chroma_client):
+    """Remove shadow collections left behind by interrupted builds (older than a day)."""
+    cutoff = time.time() - STALE_SHADOW_SECONDS
+    for name in _collection_names(chroma_client):
+        if not name.startswith(SHADOW_COLLECTION_PREFIX):
             continue
+        started_at = name[len(SHADOW_COLLECTION_PREFIX):]
+        if started_at.isdigit() and int(started_at) > cutoff:
+            continue  # Possibly a build still running in another process.
+        try:
+            chroma_client.delete_collection(name=name)
+        except Exception:
+            pass
+
+
+def _roll_back_swap(chroma_client, shadow, shadow_name, previous, on_swap=None):
+    """Undo a swap that failed after the rename: the old graph goes back in service."""
+    try:
+        shadow.modify(name=shadow_name)
+    except Exception as e:
+        print(f"      [!] Could not move the new collection aside: {e}")
+
+    if previous is None:
+        return
+    try:
+        previous.modify(name=COLLECTION_NAME)
+        if on_swap is not None:
+            on_swap(chroma_client.get_collection(name=COLLECTION_NAME))
+    except Exception as e:
+        print(f"      [!] Could not restore the previous collection: {e}")
+
+
+def _swap_in_shadow_collection(chroma_client, shadow, on_swap=None, on_commit=None):
+    """
+    Promote a fully built shadow collection to the live name.
+    The previous live collection is renamed aside and only dropped after
+    on_swap has switched in-process readers over and on_commit has recorded
+    the build, so grounding never sees a missing or half-filled collection.
+    If either callback fails the swap is rolled back to the previous graph.
+    """
+    shadow_name = shadow.name
+    try:
+        # Leftover from a swap that was interrupted before cleanup.
+        chroma_client.delete_collection(name=RETIRED_COLLECTION_NAME)
+    except Exception:
+        pass
+
+    previous = None
+    try:
+        previous = chroma_client.get_collection(name=COLLECTION_NAME)
+        previous.modify(name=RETIRED_COLLECTION_NAME)
+    except Exception:
+        previous = None  # First build: nothing to retire.
+
+    try:
+        shadow.modify(name=COLLECTION_NAME)
+    except Exception:
+        if previous is not None:
+            previous.modify(name=COLLECTION_NAME)  # Put the old graph back in service.
+        raise
+
+    readers_switched = False
+    try:
+        live = chroma_client.get_collection(name=COLLECTION_NAME)
+        if on_swap is not None:
+            readers_switched = True
+            on_swap(live)
+        if on_commit is not None:
+            on_commit()
+    except Exception:
+        _roll_back_swap(chroma_client, shadow, shadow_name, previous, on_swap if readers_switched else None)
+        raise
 
-        for col in text_cols:
-            print(f"   Profiling {table}.{col}...")
+    if previous is not None:
+        try:
+            chroma_client.delete_collection(name=RETIRED_COLLECTION_NAME)
+        except Exception as e:
+            print(f"      [!] Could not drop retired collection: {e}")
 
+    return live
+
+
+def build_graph(on_swap=None):
+    """
+    Build the VLKG into a shadow collection and atomically swap it in.
+    on_swap, if given, receives the new live collection before the old one is dropped.
+    Returns the new live collection, or None if another build is already running.
+    """
+    if not _build_lock.acquire(blocking=False):
+        print("A VLKG build is already running in this process. Skipping.")
+        return None
+
+    try:
+        print("Initializing ChromaDB Persistent Client...")
+        chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+        _drop_stale_build_collections(chroma_client)
+
+        # 3. Build into a shadow collection; the live graph stays in service meanwhile.
+        shadow = chroma_client.create_collection(
+            name=f"{SHADOW_COLLECTION_PREFIX}{int(time.time())}"
+        )
+        # Captured now: the swap renames the shadow, and chromadb updates shadow.name in place.
+        build_id = shadow.name
+        try:
+            _populate_collection(shadow, build_id=build_id)
+            live = _swap_in_shadow_collection(
+                chroma_client, shadow, on_swap, on_commit=lambda: activate_build(build_id)
+            )
+        except Exception:
+            # A failed or rolled-back swap leaves the new graph under its shadow name.
             try:
-                distinct_count = count_distinct_non_null(table, col)
-
-                if distinct_count == 0 or distinct_count > MAX_DISTINCT_VALUES:
-                    print(f"      -> Skipping (Count: {distinct_count})")
-                    continue
-
-                values = [
-                    value
-                    for value in fetch_distinct_non_null_values(table, col, MAX_DISTINCT_VALUES)
-                    if isinstance(value, str) and value.strip()
-                ]
-
-                # Setup batch arrays for ChromaDB insertion
-                batch_docs = []
-                batch_metadatas = []
-                batch_ids = []
-
-                for canonical in values:
-                    aliases = generate_synonyms(canonical, col)
-                    
-                    clean_words = [w for w in canonical.split() if w.isalnum()]
-                    if len(clean_words) > 1:
-                        initials = "".join(w[0] for w in clean_words).lower()
-                        if len(initials) > 1:
-                            aliases.append(initials)
-
-                    # Include the original canonical value in the search space
-                    aliases.append(canonical)
-                    
-                    # Deduplicate any overlap
-                    unique_aliases = list(set([a.strip() for a in aliases if a.strip()]))
-
-                    # 4. Prepare the documents and metadata for embedding
-                    for alias in unique_aliases:
-                        batch_docs.append(alias)
-                        batch_metadatas.append({
-                            "canonical": canonical,
-                            "table": table,
-                            "column": col
-                        })
-                        # ChromaDB requires a unique ID for every single document
-                        batch_ids.append(str(uuid.uuid4()))
-                
-                # 5. Generate Vectors and Insert into Database
-                if batch_docs:
-                    print(f"      -> Generating embeddings for {len(batch_docs)} textual variants...")
-                    batch_embeddings = get_embeddings_batch(batch_docs)
-                    
-                    print(f"      -> Storing in ChromaDB...")
-                    collection.add(
-                        documents=batch_docs,
-                        embeddings=batch_embeddings,
-                        metadatas=batch_metadatas,
-                        ids=batch_ids
-                    )
+                chroma_client.delete_collection(name=build_id)
+            except Exception:
+                pass
+            raise
+    finally:
+        _build_lock.release()
 
-            except Exception as e:
-                print(f"      [!] Error profiling {table}.{col}: {e}")
-    
     # Clean up the deprecated json file
     json_path = os.path.join(BASE_DIR, "vlkg.json")
     if os.path.exists(json_path):
         os.remove(json_path)
-        
+
     print(f"\nSuccessfully generated and saved Vector Database to {CHROMA_PATH}")
+    return live
+
+
+def _populate_collection(collection, build_id):
+    tables = list_user_tables()
+    executor = ThreadPoolExecutor(max_workers=_synonym_worker_count())
+
+    try:
+        for table in tables:
+            print(f"\nAnalyzing table: {table}")
+            columns_info = get_table_columns(table)
+
+            text_cols = [c["name"] for c in columns_info if is_textual_column_type(c.get("type"))]
+
+            if not text_cols:
+                print(f"   -> No text columns found in {table}. Skipping.")
+                continue
+
+            for col in text_cols:
+                print(f"   Profiling {table}.{col}...")
+
+                try:
+                    distinct_count = count_distinct_non_null(table, col)
+
+                    if distinct_count == 0:
+                        print(f"      -> Skipping (Count: {distinct_count})")
+                        continue
+                    if distinct_count > MAX_DISTINCT_VALUES:
+                        budget = column_budget(table, col)
+                        print(
+                            f"      -> High-cardinality column (Count: {distinct_count}); "
+                            f"mode={profile_mode()}, budget={budget or 'unlimited'}"
+                        )
+
+                    values_added, documents_added = profile_column(
+                        collection, build_id, table, col, executor, distinct_count=distinct_count
+                    )
+                    if documents_added:
+                        print(f"      -> Stored {values_added} values as {documents_added} textual variants.")
+
+                except Exception as e:
+                    print(f"      [!] Error profiling {table}.{col}: {e}")
+    finally:
+        # Also on failure, so no worker (or queued Groq call) outlives the build.
+        executor.shutdown(wait=True, cancel_futures=True)
+
 
 if __name__ == "__main__":
     build_graph()
\ No newline at end of file
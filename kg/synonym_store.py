@@ -0,0 +1,103 @@
+"""
+synonym_store.py
+----------------
+SQLite-backed cache of LLM-generated synonyms, keyed by
+(table, column, canonical value, prompt version).
+
+build_vlkg and update_vlkg consult it before calling Groq, so a rebuild only
+pays LLM cost for values that have never been profiled with the current prompt.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+try:
+    from backend.config import SPTS_SYNONYM_CACHE_ENABLED, SYNONYM_STORE_PATH
+except ImportError:
+    sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, "..", "backend")))
+    from config import SPTS_SYNONYM_CACHE_ENABLED, SYNONYM_STORE_PATH
+
+# Keep IN (...) parameter lists under SQLite's default variable limit.
+_LOOKUP_CHUNK_SIZE = 500
+_store_initialized = False
+
+
+def init_synonym_store():
+    global _store_initialized
+    if _store_initialized:
+        return
+
+    os.makedirs(os.path.dirname(SYNONYM_STORE_PATH), exist_ok=True)
+    with sqlite3.connect(SYNONYM_STORE_PATH, timeout=10) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS synonyms (
+                table_name TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                canonical TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                synonyms TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (table_name, column_name, canonical, prompt_version)
+            )
+        ''')
+        conn.commit()
+    _store_initialized = True
+
+
+def get_cached_synonyms(table: str, column: str, values: list, prompt_version: str) -> dict:
+    """Return {canonical: synonyms} for every value already stored under this prompt version."""
+    if not SPTS_SYNONYM_CACHE_ENABLED or not values:
+        return {}
+
+    cached = {}
+    try:
+        init_synonym_store()
+        with sqlite3.connect(SYNONYM_STORE_PATH, timeout=10) as conn:
+            for start in range(0, len(values), _LOOKUP_CHUNK_SIZE):
+                chunk = values[start:start + _LOOKUP_CHUNK_SIZE]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT canonical, synonyms FROM synonyms "
+                    f"WHERE table_name = ? AND column_name = ? AND prompt_version = ? "
+                    f"AND canonical IN ({placeholders})",
+                    (table, column, prompt_version, *chunk),
+                ).fetchall()
+                for canonical, raw_synonyms in rows:
+                    cached[canonical] = json.loads(raw_synonyms)
+    except Exception as e:
+        print(f"      [!] Synonym store lookup failed for {table}.{column}: {e}")
+        return {}
+
+    return cached
+
+
+def store_synonyms(table: str, column: str, synonyms_by_value: dict, prompt_version: str) -> None:
+    """Upsert freshly generated synonyms. Empty results are skipped so they are retried next build."""
+    if not SPTS_SYNONYM_CACHE_ENABLED:
+        return
+
+    updated_at = datetime.now(timezone.utc).isoformat()
+    rows = [
+        (table, column, canonical, prompt_version, json.dumps(synonyms), updated_at)
+        for canonical, synonyms in synonyms_by_value.items()
+        if synonyms
+    ]
+    if not rows:
+        return
+
+    try:
+        init_synonym_store()
+        with sqlite3.connect(SYNONYM_STORE_PATH, timeout=10) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO synonyms "
+                "(table_name, column_name, canonical, prompt_version, synonyms, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"      [!] Synonym store write failed for {table}.{column}: {e}")
@@ -1,82 +1,148 @@
 import os
 import sys
-import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 import chromadb
-from groq import Groq
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 try:
     # Package import path (used when loaded via backend.app)
-    from backend.embedding_util import get_embeddings_batch
-    from backend.config import CHROMA_PATH, API_KEY
+    from backend.config import (
+        CHROMA_PATH,
+        SPTS_VLKG_CHANGE_POLL_ALL_DIALECTS,
+        SPTS_VLKG_UNATTRIBUTED_REFRESH_MINUTES,
+    )
     from backend.db_client import (
-        fetch_distinct_non_null_values,
+        get_main_dialect_name,
+        get_sqlite_file_signature,
+        get_table_change_signals,
         get_table_columns,
         is_textual_column_type,
         list_user_tables,
     )
+    from kg.build_vlkg import (
+        _synonym_worker_count,
+        profile_column,
+        retry_synonyms,
+    )
+    from kg.vlkg_manifest import (
+        bootstrap_from_collection,
+        filter_new_values,
+        get_active_build_id,
+        get_watermarks,
+        save_watermarks,
+    )
 except ImportError:
     # Standalone script path (python update_vlkg.py)
     sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, "..", "backend")))
-    from embedding_util import get_embeddings_batch
-    from config import CHROMA_PATH, API_KEY
+    from config import (
+        CHROMA_PATH,
+        SPTS_VLKG_CHANGE_POLL_ALL_DIALECTS,
+        SPTS_VLKG_UNATTRIBUTED_REFRESH_MINUTES,
+    )
     from db_client import (
-        fetch_distinct_non_null_values,
+        get_main_dialect_name,
+        get_sqlite_file_signature,
+        get_table_change_signals,
         get_table_columns,
         is_textual_column_type,
         list_user_tables,
     )
+    from build_vlkg import (
+        _synonym_worker_count,
+        profile_column,
+        retry_synonyms,
+    )
+    from vlkg_manifest import (
+        bootstrap_from_collection,
+        filter_new_values,
+        get_active_build_id,
+        get_watermarks,
+        save_watermarks,
+    )
 
-_groq_client = None
+# Settings matching your build script (column value selection is shared via profile_column)
+SKIP_KEYWORDS = ['id', 'code', 'url', 'zip', 'phone', 'email', 'date', 'time', 'website']
+# Watermark key for the whole-file SQLite signal checked before any per-table query.
+SQLITE_FILE_WATERMARK = "__sqlite_file__"
+# Dialects with a cheap change signal (file stat / pg_stat_user_tables).
+CHANGE_POLL_DIALECTS = {"sqlite", "postgresql"}
 
+_refresh_lock = Lock()
+# Monotonic time of the last all-table run triggered by an unattributed file change.
+_last_unattributed_refresh = None
 
-def _get_groq_client():
-    global _groq_client
-    if _groq_client is not None:
-        return _groq_client
 
-    if not API_KEY:
-        return None
+def delta_update(tables=None):
+    """
+    Profile new distinct values into the live VLKG.
+    tables limits profiling to the given tables (incremental refresh); None scans every table.
+    Returns True when the update ran to completion.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        print("A VLKG delta update is already running. Skipping.")
+        return False
 
     try:
-        _groq_client = Groq(api_key=API_KEY)
-        return _groq_client
-    except Exception as e:
-        print(f"      [!] Failed to initialize Groq client: {e}")
-        return None
+        return _delta_update(tables)
+    finally:
+        _refresh_lock.release()
 
-# Settings matching your build script
-MAX_DISTINCT_VALUES = 100
-SKIP_KEYWORDS = ['id', 'code', 'url', 'zip', 'phone', 'email', 'date', 'time', 'website']
 
-def generate_synonyms(value, column_context):
-    client = _get_groq_client()
-    if client is None:
-        return []
+def change_polling_supported() -> bool:
+    """Whether periodic incremental_refresh is cheap enough to schedule for the main database."""
+    if SPTS_VLKG_CHANGE_POLL_ALL_DIALECTS:
+        return True
+    try:
+        return get_main_dialect_name() in CHANGE_POLL_DIALECTS
+    except Exception:
+        return False
+
 
-    prompt = f"""
-    Context: Database Column '{column_context}'.
-    Value: "{value}".
-    Task: Generate 3 likely user abbreviations, slang, or variations for this value.
-    Example: "Los Angeles Unified" -> ["LAUSD", "LA Unified", "L.A. Schools"]
-    Output ONLY JSON object with key 'synonyms'. Do not add markdown blocks.
+def incremental_refresh() -> list[str]:
     """
-    try:
-        resp = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            response_format={"type": "json_object"},
-        )
-        import json
-        content = resp.choices[0].message.content
-        data = json.loads(content)
-        return data.get("synonyms", [])
-    except Exception as e:
-        print(f"      [!] Error generating synonyms for '{value}': {e}")
+    Cheap change-driven refresh: compare per-table change signals with the stored
+    watermarks and run the delta only for tables that changed. Returns those tables.
+    """
+    global _last_unattributed_refresh
+    stored = get_watermarks()
+
+    # Captured before the per-table signals: a write after this point changes the
+    # file again, so advancing the watermark below can never hide it.
+    file_signature = get_sqlite_file_signature()
+    if file_signature is not None and stored.get(SQLITE_FILE_WATERMARK) == file_signature:
+        return []
+
+    signals = get_table_change_signals()
+    changed = [table for table, signal in signals.items() if stored.get(table) != signal]
+    if changed:
+        print(f"Incremental VLKG refresh: {len(changed)} changed table(s): {', '.join(changed)}")
+        if not delta_update(tables=changed):
+            return changed
+        # Every table's signal now matches its watermark, so the whole-file gate can advance.
+        if file_signature is not None:
+            save_watermarks({SQLITE_FILE_WATERMARK: file_signature})
+        return changed
+
+    if file_signature is None:
         return []
 
-def delta_update():
+    # The file moved but no table's count/max(rowid) did: an in-place UPDATE that the
+    # per-table signals cannot attribute. Leave the file watermark behind (so later polls
+    # keep retrying) and run a rate-limited all-table delta, which advances it on success.
+    now = time.monotonic()
+    interval = SPTS_VLKG_UNATTRIBUTED_REFRESH_MINUTES * 60
+    if _last_unattributed_refresh is not None and now - _last_unattributed_refresh < interval:
+        return []
+    _last_unattributed_refresh = now
+    print("Incremental VLKG refresh: database file changed without a per-table signal; running an all-table delta.")
+    if not delta_update():
+        return []
+    return list(signals)
+
+
+def _delta_update(tables=None):
     print("Initializing ChromaDB for Delta Update...")
     chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
     
@@ -85,96 +151,67 @@ def delta_update():
         collection = chroma_client.get_collection(name="spts_vlkg")
     except Exception as e:
         print("Error: ChromaDB collection 'spts_vlkg' not found. Please run build_vlkg.py first.")
-        return
-
-    # 1. Load existing state: Fetch all current metadata to know what we already profiled
-    print("Loading existing knowledge graph vectors to identify delta...")
-    existing_data = collection.get(include=["metadatas"])
-    
-    # Create a fast-lookup set of signatures: e.g., "schools.District.Los Angeles Unified"
-    processed_signatures = set()
-    if existing_data and existing_data["metadatas"]:
-        for meta in existing_data["metadatas"]:
-            if meta:
-                sig = f"{meta['table']}.{meta['column']}.{meta['canonical']}"
-                processed_signatures.add(sig)
-                
-    print(f"-> Found {len(processed_signatures)} unique semantic records already in Vector DB.")
-
-    tables = list_user_tables()
-
+        return False
+
+    # 1. Existing state lives in the sidecar manifest; only collections built before it
+    # existed need a one-time paged scan of their metadata.
+    build_id = get_active_build_id()
+    if build_id is None:
+        build_id = f"{collection.name}__manifest_bootstrap"
+        print("No VLKG manifest found. Bootstrapping it with a paged metadata scan...")
+        scanned = bootstrap_from_collection(collection, build_id)
+        print(f"-> Recorded signatures from {scanned} stored aliases.")
+
+    # Capture change signals before profiling so writes made during the run are seen next time.
+    file_signature = get_sqlite_file_signature() if tables is None else None
+    all_tables = list_user_tables()
+    tables = [table for table in all_tables if tables is None or table in tables]
+    signals = get_table_change_signals(tables)
     total_new_values_added = 0
+    executor = ThreadPoolExecutor(max_workers=_synonym_worker_count())
 
-    for table in tables:
-        columns_info = get_table_columns(table)
-
-        text_cols = [c["name"] for c in columns_info if is_textual_column_type(c.get("type"))]
-
-        for col in text_cols:
-            if any(keyword in col.lower() for keyword in SKIP_KEYWORDS):
-                continue
-
-            try:
-                # Fetch distinct values from the live database
-                current_values = [
-                    value
-                    for value in fetch_distinct_non_null_values(table, col, MAX_DISTINCT_VALUES)
-                    if isinstance(value, str) and value.strip()
-                ]
-
-                # 2. Delta Comparison: Filter out values we've already profiled
-                new_values = []
-                for val in current_values:
-                    sig = f"{table}.{col}.{val}"
-                    if sig not in processed_signatures:
-                        new_values.append(val)
-
-                if not new_values:
-                    # Silent skip if no new data exists for this column
-                    continue 
-                    
-                print(f"\n   -> Detected {len(new_values)} NEW distinct values in {table}.{col}. Processing Delta...")
-
-                batch_docs = []
-                batch_metadatas = []
-                batch_ids = []
-
-                for canonical in new_values:
-                    aliases = generate_synonyms(canonical, col)
-                    
-                    clean_words = [w for w in canonical.split() if w.isalnum()]
-                    if len(clean_words) > 1:
-                        initials = "".join(w[0] for w in clean_words).lower()
-                        if len(initials) > 1:
-                            aliases.append(initials)
-
-                    aliases.append(canonical)
-                    unique_aliases = list(set([a.strip() for a in aliases if a.strip()]))
-
-                    for alias in unique_aliases:
-                        batch_docs.append(alias)
-                        batch_metadatas.append({
-                            "canonical": canonical,
-                            "table": table,
-                            "column": col
-                        })
-                        batch_ids.append(str(uuid.uuid4()))
-                
-                # 3. Append to Vector Database
-                if batch_docs:
-                    batch_embeddings = get_embeddings_batch(batch_docs)
-                    collection.add(
-                        documents=batch_docs,
-                        embeddings=batch_embeddings,
-                        metadatas=batch_metadatas,
-                        ids=batch_ids
+    try:
+        for table in tables:
+            columns_info = get_table_columns(table)
+
+            text_cols = [c["name"] for c in columns_info if is_textual_column_type(c.get("type"))]
+
+            for col in text_cols:
+                if any(keyword in col.lower() for keyword in SKIP_KEYWORDS):
+                    continue
+
+                try:
+                    # Delta Comparison: each chunk of live values is narrowed to the ones not yet profiled
+                    values_added, _ = profile_column(
+                        collection,
+                        build_id,
+                        table,
+                        col,
+                        executor,
+                        value_filter=lambda chunk, table=table, col=col: filter_new_values(build_id, table, col, chunk),
                     )
-                    total_new_values_added += len(new_values)
 
-            except Exception as e:
-                print(f"      [!] Error processing delta for {table}.{col}: {e}")
+                    if values_added:
+                        print(f"   -> Appended {values_added} NEW distinct values from {table}.{col}.")
+                        total_new_values_added += values_added
+
+                    # Values whose synonym batch failed earlier are known to the manifest,
+                    # so the filter above skips them; their synonyms are retried here.
+                    retried = retry_synonyms(collection, build_id, table, col, executor)
+                    if retried:
+                        print(f"   -> Added {retried} retried synonym aliases for {table}.{col}.")
+
+                except Exception as e:
+                    print(f"      [!] Error processing delta for {table}.{col}: {e}")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if file_signature is not None:
+        signals[SQLITE_FILE_WATERMARK] = file_signature
+    save_watermarks(signals)
 
     print(f"\n✅ Delta Update Complete! Embedded and appended {total_new_values_added} new unique database values.")
+    return True
 
 if __name__ == "__main__":
     delta_update()
\ No newline at end of file
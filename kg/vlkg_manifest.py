@@ -0,0 +1,217 @@
+"""
+vlkg_manifest.py
+----------------
+SQLite sidecar manifest of the (table, column, canonical) signatures stored
+in the live VLKG collection.
+
+Each build records its signatures under its own build id and activates that
+id when its collection is swapped in, so rows from interrupted builds never
+leak into delta detection. delta_update checks one column's values at a time
+against the manifest instead of loading every alias's metadata from Chroma.
+
+It also stores the per-table change signals (watermarks) seen by the last
+refresh, so incremental refreshes only profile tables that changed, and the
+values whose synonym requests failed, so delta runs retry them.
+"""
+
+import os
+import sqlite3
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+try:
+    from backend.config import VLKG_MANIFEST_PAGE_SIZE, VLKG_MANIFEST_PATH
+except ImportError:
+    sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, "..", "backend")))
+    from config import VLKG_MANIFEST_PAGE_SIZE, VLKG_MANIFEST_PATH
+
+# Keep IN (...) parameter lists under SQLite's default variable limit.
+_LOOKUP_CHUNK_SIZE = 500
+_manifest_initialized = False
+
+
+def init_manifest():
+    global _manifest_initialized
+    if _manifest_initialized:
+        return
+
+    os.makedirs(os.path.dirname(VLKG_MANIFEST_PATH), exist_ok=True)
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS signatures (
+                build_id TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                canonical TEXT NOT NULL,
+                PRIMARY KEY (build_id, table_name, column_name, canonical)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS synonym_retries (
+                build_id TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                canonical TEXT NOT NULL,
+                PRIMARY KEY (build_id, table_name, column_name, canonical)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS table_watermarks (
+                table_name TEXT PRIMARY KEY,
+                signal TEXT NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS manifest_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+        conn.commit()
+    _manifest_initialized = True
+
+
+def get_active_build_id() -> str | None:
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        row = conn.execute(
+            "SELECT value FROM manifest_meta WHERE key = 'active_build_id'"
+        ).fetchone()
+    return row[0] if row else None
+
+
+def record_signatures(build_id: str, table: str, column: str, canonicals: list) -> None:
+    if not canonicals:
+        return
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO signatures (build_id, table_name, column_name, canonical) "
+            "VALUES (?, ?, ?, ?)",
+            [(build_id, table, column, str(canonical)) for canonical in canonicals],
+        )
+        conn.commit()
+
+
+def activate_build(build_id: str) -> None:
+    """Mark build_id as describing the live collection and drop every other build's rows."""
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO manifest_meta (key, value) VALUES ('active_build_id', ?)",
+            (build_id,),
+        )
+        conn.execute("DELETE FROM signatures WHERE build_id != ?", (build_id,))
+        conn.execute("DELETE FROM synonym_retries WHERE build_id != ?", (build_id,))
+        conn.commit()
+
+
+def record_synonym_retries(build_id: str, table: str, column: str, canonicals: list) -> None:
+    """Remember stored values whose synonym request failed so a later delta run retries them."""
+    if not canonicals:
+        return
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO synonym_retries (build_id, table_name, column_name, canonical) "
+            "VALUES (?, ?, ?, ?)",
+            [(build_id, table, column, str(canonical)) for canonical in canonicals],
+        )
+        conn.commit()
+
+
+def get_synonym_retries(build_id: str, table: str, column: str) -> list[str]:
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        rows = conn.execute(
+            "SELECT canonical FROM synonym_retries "
+            "WHERE build_id = ? AND table_name = ? AND column_name = ? ORDER BY canonical",
+            (build_id, table, column),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def clear_synonym_retries(build_id: str, table: str, column: str, canonicals: list) -> None:
+    if not canonicals:
+        return
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        conn.executemany(
+            "DELETE FROM synonym_retries "
+            "WHERE build_id = ? AND table_name = ? AND column_name = ? AND canonical = ?",
+            [(build_id, table, column, str(canonical)) for canonical in canonicals],
+        )
+        conn.commit()
+
+
+def filter_new_values(build_id: str, table: str, column: str, values: list) -> list:
+    """Return the values (in input order) that have no signature under build_id yet."""
+    if not values:
+        return []
+
+    init_manifest()
+    known = set()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        for start in range(0, len(values), _LOOKUP_CHUNK_SIZE):
+            chunk = [str(value) for value in values[start:start + _LOOKUP_CHUNK_SIZE]]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = conn.execute(
+                f"SELECT canonical FROM signatures "
+                f"WHERE build_id = ? AND table_name = ? AND column_name = ? "
+                f"AND canonical IN ({placeholders})",
+                (build_id, table, column, *chunk),
+            ).fetchall()
+            known.update(row[0] for row in rows)
+
+    return [value for value in values if str(value) not in known]
+
+
+def bootstrap_from_collection(collection, build_id: str) -> int:
+    """
+    Populate the manifest from an existing collection with a paged metadata scan,
+    so collections built before the manifest existed can still use delta runs.
+    Memory stays bounded by VLKG_MANIFEST_PAGE_SIZE.
+    """
+    page_size = max(1, VLKG_MANIFEST_PAGE_SIZE)
+    offset = 0
+    scanned = 0
+
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        metadatas = page.get("metadatas") or []
+        if not metadatas:
+            break
+
+        grouped: dict[tuple[str, str], set] = {}
+        for meta in metadatas:
+            if meta:
+                grouped.setdefault((meta["table"], meta["column"]), set()).add(meta["canonical"])
+        for (table, column), canonicals in grouped.items():
+            record_signatures(build_id, table, column, list(canonicals))
+
+        scanned += len(metadatas)
+        if len(metadatas) < page_size:
+            break
+        offset += page_size
+
+    activate_build(build_id)
+    return scanned
+
+
+def get_watermarks() -> dict[str, str]:
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        rows = conn.execute("SELECT table_name, signal FROM table_watermarks").fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def save_watermarks(signals: dict[str, str]) -> None:
+    if not signals:
+        return
+    init_manifest()
+    with sqlite3.connect(VLKG_MANIFEST_PATH, timeout=10) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO table_watermarks (table_name, signal) VALUES (?, ?)",
+            list(signals.items()),
+        )
+        conn.commit()